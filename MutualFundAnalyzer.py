@@ -1,235 +1,81 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import os
 import json
-import base64
-from datetime import datetime, date, timedelta, time
+import threading
+import time as time_module
+from datetime import datetime, date, time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import math
 from ticker_mappings import COMPANY_TICKER_MAPPINGS
-import requests
-from bs4 import BeautifulSoup
-import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
-import re
+from quotes import Quote, QuoteFetcher, SHARED_QUOTE_CACHE, hedged_fetch, stale_quote
+from negative_cache import get_negative_cache
+from http_client import get_http_client, BlockedResponseError, CircuitOpenError
+from snapshot_store import SnapshotStore, FundSnapshot, holdings_hash
+from browser_pool import get_browser_pool, fetch_equity_portion
+from fund_page import next_data_text, parse_next_data, fund_name_from_url
+from page_cache import PageCache, PageCacheEntry, payload_hash
+from nav_engine import SHARED_NAV_ENGINE
+from sheet_manager import SheetManager
+from instrumentation import TRACER
+from ticker_index import get_ticker_index
+from bhavcopy import get_eod_source, settled_session
 from datetime import time as time_class  # Rename the import to avoid conflict
 
-class SheetManager:
-    def __init__(self):
-        try:
-            self.client = self._authenticate()
-            self.connected = True
-        except Exception as e:
-            print(f"Warning: Could not connect to Google Sheets ({str(e)}). Using local mode.")
-            self.connected = False
-            self.local_records = {}
-        
-        self.FIELD_NAMES = [
-            'date', 'calculation_time', 
-            'calculated_nav', 'official_nav', 
-            'difference', 'percentage_diff',
-            'fund_name', 'equity_portion'
-        ]
-        
-    def get_sheet_for_fund(self, fund_name):
-        """Get or create a worksheet for the specific fund"""
-        if not self.connected:
-            if fund_name not in self.local_records:
-                self.local_records[fund_name] = []
-            return None  # Return None for local mode
-        
-        try:
-            # Open the main spreadsheet
-            spreadsheet = self.client.open("NAV Results")
-        except gspread.SpreadsheetNotFound:
-            # Create new spreadsheet if it doesn't exist
-            spreadsheet = self.client.create("NAV Results")
-        
-        try:
-            # Try to get the worksheet for this fund
-            worksheet = spreadsheet.worksheet(fund_name)
-        except gspread.WorksheetNotFound:
-            # Create new worksheet if it doesn't exist
-            worksheet = spreadsheet.add_worksheet(title=fund_name, rows=1000, cols=20)
-            worksheet.append_row(self.FIELD_NAMES)
-        
-        return worksheet
+# Trading session used to decide when calculations are stored
+MARKET_OPEN = time_class(9, 15)
+MARKET_CLOSE = time_class(15, 30)
 
-    def get_todays_record(self, fund_name, today_date):
-        """Get today's existing record if it exists"""
-        worksheet = self.get_sheet_for_fund(fund_name)
-        
-        if not self.connected:
-            # Local mode handling
-            for record in self.local_records.get(fund_name, []):
-                if record['date'] == today_date:
-                    return record
-            return None
-        
-        records = worksheet.get_all_records()
-        for idx, record in enumerate(records, start=2):  # Rows start at 2
-            if record['date'] == today_date:
-                record['row_num'] = idx  # Store the row number for updates
-                return record
-        return None
+# Intraday records are only rewritten when the NAV moves by more than this
+NAV_CHANGE_THRESHOLD = 0.0001
 
-    def update_record(self, fund_name, row_num, record_data):
-        """Update an existing record"""
-        worksheet = self.get_sheet_for_fund(fund_name)
-        
-        if not self.connected:
-            # Local mode handling
-            for i, record in enumerate(self.local_records.get(fund_name, [])):
-                if record['date'] == record_data['date']:
-                    self.local_records[fund_name][i] = record_data
-                    break
-            return
-        
-        row_data = [record_data.get(field, '') for field in self.FIELD_NAMES]
-        worksheet.update(f"A{row_num}:H{row_num}", [row_data])
-
-    def _authenticate(self):
-        """Authenticate with Google Sheets"""
-        if 'GDRIVE_CREDENTIALS' not in os.environ:
-            raise Exception("GDRIVE_CREDENTIALS environment variable not set")
-            
-        creds_json = base64.b64decode(os.environ['GDRIVE_CREDENTIALS']).decode('utf-8')
-        creds_dict = json.loads(creds_json)
-        scope = [
-            'https://spreadsheets.google.com/feeds',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        return gspread.authorize(creds)
-    
-    def get_all_records(self, fund_name):
-        """Get all records from the fund's sheet as dictionaries"""
-        worksheet = self.get_sheet_for_fund(fund_name)
-        
-        if not self.connected:
-            return self.local_records.get(fund_name, [])
-        
-        return worksheet.get_all_records()
-    
-    def add_record(self, fund_name, record_data):
-        """Add a new record to the fund's sheet"""
-        worksheet = self.get_sheet_for_fund(fund_name)
-        
-        if not self.connected:
-            if fund_name not in self.local_records:
-                self.local_records[fund_name] = []
-            self.local_records[fund_name].append(record_data)
-            return
-        
-        row_data = [record_data.get(field, '') for field in self.FIELD_NAMES]
-        worksheet.append_row(row_data)
-    
-    def update_official_nav(self, fund_name, official_nav, target_date=None):
-        """Update the official NAV for a specific fund and date"""
-        if target_date is None:
-            target_date = (date.today() - timedelta(days=1)).strftime("%d/%m/%Y")
-        
-        worksheet = self.get_sheet_for_fund(fund_name)
-        
-        if not self.connected:
-            updated = False
-            for record in self.local_records.get(fund_name, []):
-                if record['date'] == target_date:
-                    if not record['official_nav'] or record['official_nav'] == '':
-                        record['official_nav'] = str(official_nav)
-                        
-                        if record['calculated_nav'] and record['calculated_nav'] != '':
-                            calculated = float(record['calculated_nav'])
-                            diff = official_nav - calculated
-                            percentage_diff = (diff / calculated) * 100
-                            
-                            record['difference'] = str(round(diff, 4))
-                            record['percentage_diff'] = str(round(percentage_diff, 4))
-                        
-                        updated = True
-            return updated
-        
-        records = worksheet.get_all_records()
-        updated = False
-        
-        for idx, row in enumerate(records, start=2):  # Start from row 2 (1-based index)
-            if row['date'] == target_date:
-                if not row['official_nav'] or row['official_nav'] == '':
-                    # Update official NAV
-                    worksheet.update_cell(idx, 4, str(official_nav))
-                    
-                    # Calculate and update difference if calculated_nav exists
-                    if row['calculated_nav'] and row['calculated_nav'] != '':
-                        calculated = float(row['calculated_nav'])
-                        diff = official_nav - calculated
-                        percentage_diff = (diff / calculated) * 100
-                        
-                        worksheet.update_cell(idx, 5, str(round(diff, 4)))
-                        worksheet.update_cell(idx, 6, str(round(percentage_diff, 4)))
-                    
-                    updated = True
-                    break
-        
-        return updated
-    
-    def get_previous_calculation(self, fund_name):
-        """Get yesterday's calculation for a fund"""
-        yesterday = (date.today() - timedelta(days=1)).strftime("%d/%m/%Y")
-        records = self.get_all_records(fund_name)
-        
-        for row in reversed(records):
-            if row['date'] == yesterday:
-                return {
-                    'calculated_nav': float(row['calculated_nav']) if row['calculated_nav'] else None,
-                    'official_nav': float(row['official_nav']) if row['official_nav'] else None
-                }
-        return None
-    
-    def show_comparison(self, fund_name):
-        """Show historical comparison for a fund"""
-        print(f"\nHistorical Comparison for {fund_name}:")
-        print("{:<12} {:<10} {:<12} {:<12} {:<10} {:<8}".format(
-            'Date', 'Calc NAV', 'Official NAV', 'Difference', '% Diff', 'Time'
-        ))
-        print("-" * 70)
-        
-        records = self.get_all_records(fund_name)
-        found_data = False
-
-        count = 0
-        for row in reversed(records):
-            date_str = row['date']
-            calc_nav = row['calculated_nav'] or '-'
-            official_nav = row['official_nav'] or '-'
-            diff = row['difference'] or '-'
-            perc_diff = row['percentage_diff'] or '-'
-            time_str = row['calculation_time'] or '-'
-            
-            print("{:<12} {:<10} {:<12} {:<12} {:<10} {:<8}".format(
-                date_str, calc_nav, official_nav, diff, perc_diff, time_str
-            ))
-            found_data = True
-            
-            if count == 2:
-                break
-            count = count + 1
-        
-        if not found_data:
-            print(f"No historical data found for {fund_name}")
+# Deadline runs only store estimates that price at least this share of the holdings
+MIN_STORE_COVERAGE = 0.9
 
 class MutualFundAnalyzer:
-    def __init__(self, url, equity_portion=None, max_workers=None, base_workers=5):
+    def __init__(self, url, equity_portion=None, max_workers=None, base_workers=5, quote_cache=None,
+                 execution_mode="threaded", async_concurrency=50, hedge_delay=None, snapshot_store=None,
+                 browser_pool=None, http=None, sheet_manager=None, nav_engine=None, ticker_index=None,
+                 page_cache=None, eod_source=None, deadline=None, negative_cache=None, refine_wait=None):
         self.url = url
         self.equity_portion = equity_portion
         self.fund_name = self._extract_fund_name()
         self.base_workers = base_workers
         self.max_workers = max_workers
         self.dynamic_workers = None
-        self.sheet_manager = SheetManager()
+        if execution_mode not in ("threaded", "async"):
+            raise ValueError(f"Unknown execution mode: {execution_mode}")
+        self.execution_mode = execution_mode
+        self.async_concurrency = async_concurrency
+        # None keeps the sequential NSE -> BSE fallback; a number of seconds
+        # (0 for immediately) races the BSE listing against a slow NSE one
+        self.hedge_delay = hedge_delay
+        self.sheet_manager = sheet_manager if sheet_manager is not None else SheetManager()
+        self.http = http if http is not None else get_http_client()
+        # Listings whose quotes keep failing are skipped until their next re-probe
+        self.negative_cache = negative_cache if negative_cache is not None else get_negative_cache()
+        self.quote_fetcher = QuoteFetcher(self.http, negative_cache=self.negative_cache)
+        self.quote_cache = quote_cache if quote_cache is not None else SHARED_QUOTE_CACHE
+        self.snapshot_store = snapshot_store if snapshot_store is not None else SnapshotStore()
+        self.holdings_hash = None
+        self.fund_page = None
+        self.page_cache = page_cache if page_cache is not None else PageCache()
+        self.page_entry = None
+        self.page_changed = True
+        self.nav_engine = nav_engine if nav_engine is not None else SHARED_NAV_ENGINE
+        self._engine_registration = None
+        self.browser_pool = browser_pool if browser_pool is not None else get_browser_pool()
+        # Loaded on the first holding missing from the hand-kept mappings
+        self.ticker_index = ticker_index
+        self.eod_source = eod_source if eod_source is not None else get_eod_source()
+        # Seconds the quotes stage may take; holdings still outstanding are
+        # reported as missing and refine the estimate when they arrive
+        self.deadline = deadline
+        # Opt-in extra seconds a run below MIN_STORE_COVERAGE waits for late
+        # quotes; without it a deadline run returns when the deadline expires
+        self.refine_wait = refine_wait
+        self._quote_worker = None
+        self._late = set()  # this fund's holdings that missed the last deadline
+        self._late_changed = set()  # funds moved by late quotes since pop_late_changes()
+        self._late_lock = threading.Lock()
+        self.coverage = None
+        self.missing_holdings = []
         
         self.companies_ticker_and_Exchange = COMPANY_TICKER_MAPPINGS
         self.Last_day_closed = None
@@ -239,12 +85,12 @@ class MutualFundAnalyzer:
 
     def _calculate_optimal_workers(self, holdings_count):
         """
-        Calculate optimal number of workers based on holdings count
-        Uses square root scaling with base minimum and optional maximum
+        Calculate the number of worker threads for the quote fetch
+        Enough threads to reach the HTTP client's adaptive concurrency ceiling;
+        the per-host limiter decides how many requests actually run at once
         """
-        # Square root scaling gives us a good balance between parallelism and overhead
-        calculated = max(self.base_workers, math.floor(math.sqrt(holdings_count) * 1.8))
-        
+        calculated = max(self.base_workers, min(holdings_count, self.http.max_concurrency))
+
         # Apply maximum limit if specified
         if self.max_workers is not None:
             return min(calculated, self.max_workers)
@@ -252,11 +98,7 @@ class MutualFundAnalyzer:
 
     def _extract_fund_name(self):
         """Extract fund name from URL"""
-        # Extract the fund name part from the URL
-        fund_part = self.url.split('/')[-1].replace('-direct-growth', '').replace('-', ' ').title()
-        # Remove any "Direct" or "Growth" suffixes
-        fund_part = fund_part.replace('Direct', '').replace('Growth', '').strip()
-        return fund_part
+        return fund_name_from_url(self.url)
 
     def _clean_company_name(self, name):
         """Clean and standardize company names"""
@@ -268,124 +110,150 @@ class MutualFundAnalyzer:
                 .replace("(", "")
                 .replace(")", ""))
 
-    def _get_equity_percentage_parallel(self):
-        """Fetch equity percentage using Selenium in parallel with other operations"""
-        def fetch_equity():
-            try:
-                chrome_options = Options()
-                chrome_options.add_argument("--headless=new")
-                chrome_options.add_argument("--disable-gpu")
-                chrome_options.add_argument("--window-size=1920,1080")
-
-                driver = webdriver.Chrome(
-                    service=ChromeService(ChromeDriverManager().install()),
-                    options=chrome_options
-                )
-                driver.get(self.url)
-
-                time.sleep(2)
-
-                # Scroll to bottom
-                last_height = driver.execute_script("return document.body.scrollHeight")
-                while True:
-                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(2)
-                    new_height = driver.execute_script("return document.body.scrollHeight")
-                    if new_height == last_height:
-                        break
-                    last_height = new_height
-
-                body_text = driver.find_element(By.TAG_NAME, "body").text
-
-                pattern = r"Equity\s*\n\s*([+-]?[0-9]*\.?[0-9]+%)"
-                match = re.search(pattern, body_text)
-
-                if match:
-                    equity_str = match.group(1).replace('%', '')
-                    return float(equity_str) / 100
-                else:
-                    return 0.95
-                return None
+    def _fetch_equity_portion(self):
+        """Scrape the equity allocation from the rendered fund page with a pooled browser"""
+        try:
+            with self._stage('selenium') as span:
+                span['equity_portion'] = fetch_equity_portion(self.browser_pool, self.url)
+            return span['equity_portion']
+        except Exception as e:
+            print(f"Error fetching equity percentage: {str(e)}")
+            return None
 
-            except Exception as e:
-                print(f"Error fetching equity percentage: {str(e)}")
-                return None
-            finally:
-                driver.quit()
+    def _apply_equity_portion(self, equity_portion):
+        """Use a scraped equity portion and snapshot it with the current holdings"""
+        if equity_portion is None:
+            print("Warning: Could not determine equity portion, defaulting to 95.4%")
+            self.equity_portion = 0.954
+            return
 
+        self.equity_portion = equity_portion
+        print(f"Automatically determined equity portion: {self.equity_portion*100:.1f}%")
+        try:
+            self.snapshot_store.save(FundSnapshot(
+                self.fund_name,
+                self.stock_search_company_name_stock_correcponding_holding_pairs,
+                equity_portion,
+                source_hash=self.holdings_hash
+            ))
+        except OSError as e:
+            print(f"Warning: Could not save holdings snapshot ({str(e)})")
+
+    def _get_equity_percentage_parallel(self):
+        """Fetch equity percentage using Selenium in parallel with other operations"""
         # Start equity fetching in parallel
         with ThreadPoolExecutor(max_workers=1) as executor:
-            equity_future = executor.submit(fetch_equity)
+            equity_future = executor.submit(self._fetch_equity_portion)
             
             # Proceed with other operations while equity fetches
             if not self._fetch_mf_data_without_equity():
                 return False
 
             # Get equity result
-            self.equity_portion = equity_future.result()
-            if self.equity_portion is None:
-                print("Warning: Could not determine equity portion, defaulting to 95.4%")
-                self.equity_portion = 0.954
-            else:
-                print(f"Automatically determined equity portion: {self.equity_portion*100:.1f}%")
+            self._apply_equity_portion(equity_future.result())
 
         return True
 
-    def _fetch_mf_data_without_equity(self):
-        """Fetch MF data without equity percentage"""
-        try:
-            response = requests.get(self.url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
+    def _load_fund_page(self):
+        """Download and parse the fund page once per analyzer
 
-            # Get last day NAV
-            script_content = soup.find('script', {'id': "__NEXT_DATA__"})
-            if not script_content:
-                raise ValueError("Holdings data script not found")
-            script_content = script_content.text
-
-            nav_element_start = script_content.find('"nav":')
-            nav_element = script_content[nav_element_start+6:nav_element_start+11]
-        
-            if not nav_element:
-                raise ValueError("NAV element not found")
+        The copy from the last run is revalidated with a conditional request,
+        and a page whose __NEXT_DATA__ payload is unchanged is not parsed again.
+        """
+        if self.fund_page is None:
+            with self._stage('fund_page') as span:
+                cached = self.page_cache.load(self.url)
+                response = self.http.get(self.url, timeout=10, headers=self.page_cache.conditional_headers(cached))
+
+                if response.status_code == 304 and cached is not None:
+                    span['cache'] = 'not_modified'
+                    self.page_entry = cached
+                else:
+                    response.raise_for_status()
+                    payload = next_data_text(response.text)
+                    digest = payload_hash(payload)
+                    if cached is not None and cached.payload_hash == digest:
+                        span['cache'] = 'unchanged'
+                        self.page_entry = cached
+                    else:
+                        span['cache'] = 'miss'
+                        self.page_entry = PageCacheEntry(self.url, digest, parse_next_data(json.loads(payload)))
+                    self.page_entry.etag = response.headers.get('ETag')
+                    self.page_entry.last_modified = response.headers.get('Last-Modified')
+                    self._save_page_entry()
+
+                self.page_changed = span['cache'] == 'miss'
+                self.fund_page = self.page_entry.page
+                span['holdings'] = len(self.fund_page.holdings)
+        return self.fund_page
+
+    def _save_page_entry(self):
+        try:
+            self.page_cache.save(self.page_entry)
+        except OSError as e:
+            print(f"Warning: Could not save fund page cache ({str(e)})")
+
+    def _map_holdings(self, holdings_list):
+        """Clean company names, weights and holdings hash, reused while the page is unchanged"""
+        mapping = None if self.page_changed else self.page_entry.mapping
+        if mapping is not None:
+            self.stock_search_company_name_char_str = mapping['companies']
+            self.stock_search_company_name_stock_correcponding_holding_pairs = mapping['corpus_per']
+            self.holdings_hash = mapping['holdings_hash']
+            return mapping['tickers']
+
+        # Process holdings data
+        self.stock_search_company_name_char_str = [
+            self._clean_company_name(holding.company_name)
+            for holding in holdings_list
+        ]
 
-            self.Last_day_closed = float(nav_element.strip().replace(",",""))
-            
-            # Get holdings data
-            holdings_start = script_content.find('"holdings":')
-            holdings_end = script_content.find('"nav":')
+        self.stock_search_company_name_stock_correcponding_holding_pairs = {
+            company: holding.corpus_per
+            for company, holding in zip(self.stock_search_company_name_char_str, holdings_list)
+        }
 
-            if holdings_start == -1 or holdings_end == -1:
-                raise ValueError("Could not parse holdings data")
+        self.holdings_hash = holdings_hash(self.stock_search_company_name_stock_correcponding_holding_pairs)
+        return {}
 
-            holdings_text = script_content[holdings_start+11:holdings_end-1].replace('null', 'None')
-            holdings_list = eval(holdings_text)
+    def _fetch_mf_data_without_equity(self):
+        """Fetch MF data without equity percentage"""
+        try:
+            fund_page = self._load_fund_page()
 
-            # Process holdings data
-            self.stock_search_company_name_char_str = [
-                self._clean_company_name(d['company_name'])
-                for d in holdings_list
-            ]
+            # Get last day NAV
+            self.Last_day_closed = fund_page.nav
+            holdings_list = fund_page.holdings
 
-            self.stock_search_company_name_stock_correcponding_holding_pairs = {
-                company: d['corpus_per']
-                for company, d in zip(self.stock_search_company_name_char_str, holdings_list)
-            }
+            cached_tickers = self._map_holdings(holdings_list)
 
             # Calculate optimal workers based on holdings count
             holdings_count = len(self.stock_search_company_name_char_str)
             self.dynamic_workers = self._calculate_optimal_workers(holdings_count)
-            print(f"\nDetected {holdings_count} holdings - using {self.dynamic_workers} parallel workers")
+            self.http.ensure_pool_size(self.dynamic_workers)
+            print(f"\nDetected {holdings_count} holdings - using up to {self.dynamic_workers} parallel workers")
 
-            # Map company names to tickers
-            for company in self.stock_search_company_name_char_str:
+            # Map company names to tickers; index matches from the last run are
+            # reused, but unresolved holdings are looked up again
+            for company, holding in zip(self.stock_search_company_name_char_str, holdings_list):
                 if company in self.companies_ticker_and_Exchange:
                     self.companies_ticker_and_Exchange_of_this_particular_MF[company] = \
                         self.companies_ticker_and_Exchange[company]
+                elif cached_tickers.get(company, ['UNKNOWN', '0']) != ['UNKNOWN', '0']:
+                    self.companies_ticker_and_Exchange_of_this_particular_MF[company] = cached_tickers[company]
                 else:
-                    print(f"Warning: No ticker mapping found for {company}")
-                    self.companies_ticker_and_Exchange_of_this_particular_MF[company] = ['UNKNOWN', '0']
+                    self.companies_ticker_and_Exchange_of_this_particular_MF[company] = \
+                        self._resolve_ticker(holding.company_name)
+
+            mapping = {
+                'companies': self.stock_search_company_name_char_str,
+                'corpus_per': self.stock_search_company_name_stock_correcponding_holding_pairs,
+                'holdings_hash': self.holdings_hash,
+                'tickers': self.companies_ticker_and_Exchange_of_this_particular_MF,
+            }
+            if mapping != self.page_entry.mapping:
+                self.page_entry.mapping = mapping
+                self._save_page_entry()
 
             return True
 
@@ -393,93 +261,337 @@ class MutualFundAnalyzer:
             print(f"Error fetching MF data: {str(e)}")
             return False
 
+    def _resolve_ticker(self, company_name):
+        """Look up a holding missing from the mappings in the security master index"""
+        if self.ticker_index is None:
+            self.ticker_index = get_ticker_index()
+
+        match = self.ticker_index.resolve(company_name)
+        if match is None:
+            TRACER.count('ticker.unresolved')
+            print(f"Warning: No ticker mapping found for {company_name}")
+            return ['UNKNOWN', '0']
+
+        TRACER.count(f'ticker.{match.method}')
+        if match.method == 'fuzzy':
+            print(f"Matched {company_name} to {match.matched_name} ({match.confidence:.0%} confidence)")
+        return match.tickers
+
     def fetch_mf_data(self):
-        """Main method to fetch all data with parallel equity fetching"""
-        if self.equity_portion is None:
-            return self._get_equity_percentage_parallel()
-        else:
+        """Main method to fetch all data, reusing the holdings snapshot when it is fresh"""
+        if self.equity_portion is not None:
             return self._fetch_mf_data_without_equity()
 
-    def _get_price(self, ticker, exchange, price_type="current"):
-        """Unified method to get stock prices"""
-        try:
-            url = f'https://www.google.com/finance/quote/{ticker}:{exchange}?hl=en'
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
+        snapshot = self.snapshot_store.load(self.fund_name)
+        if not self.snapshot_store.is_fresh(snapshot):
+            return self._get_equity_percentage_parallel()
 
-            class_name = "YMlKec fxKbKc" if price_type == "current" else "P6K39c"
-            price_element = soup.find(class_=class_name)
+        if not self._fetch_mf_data_without_equity():
+            return False
 
-            if price_element:
-                return float(price_element.text.strip()[1:].replace(",", ""))
-        except Exception as e:
-            print(f"Error getting {price_type} price for {ticker} on {exchange}: {str(e)}")
-        return None
+        if self.snapshot_store.is_fresh(snapshot, self.holdings_hash):
+            self.equity_portion = snapshot.equity_portion
+            print(f"Using equity portion from snapshot of {snapshot.fetched_at:%d/%m/%Y}: "
+                  f"{self.equity_portion*100:.1f}%")
+        else:
+            print("Holdings changed since last snapshot - refreshing equity portion")
+            self._apply_equity_portion(self._fetch_equity_portion())
+        return True
 
-    def _fetch_company_prices(self, company):
-        """Helper method for parallel execution"""
-        ticker_and_exchange = self.companies_ticker_and_Exchange_of_this_particular_MF[company]
-        holding_pct = self.stock_search_company_name_stock_correcponding_holding_pairs[company]
-        
-        if ticker_and_exchange[0] == 'UNKNOWN' and ticker_and_exchange[1] == '0':
-            return company, (0, 0)
-            
-        # Try NSE first
+    def _get_quote(self, ticker, exchange):
+        """Fetch current price and previous close from a single quote page load"""
+        try:
+            return self.quote_cache.get_or_fetch(ticker, exchange, self.quote_fetcher.fetch)
+        except (CircuitOpenError, BlockedResponseError):
+            # The host is refusing requests; stale_quote() covers the holding
+            return None
+
+    def _quote_candidates(self, ticker_and_exchange):
+        """Listings to try for a holding, NSE first then BSE"""
+        candidates = []
         if ticker_and_exchange[0] != 'UNKNOWN':
-            current_price = self._get_price(ticker_and_exchange[0], "NSE", "current")
-            last_price = self._get_price(ticker_and_exchange[0], "NSE", "last")
-            if current_price is not None and last_price is not None:
-                return company, (
-                    (current_price * holding_pct) / 100,
-                    (last_price * holding_pct) / 100
-                )
-        
-        # Fallback to BSE
+            candidates.append((ticker_and_exchange[0], "NSE"))
         if ticker_and_exchange[1] != '0':
-            current_price = self._get_price(ticker_and_exchange[1], "BOM", "current")
-            last_price = self._get_price(ticker_and_exchange[1], "BOM", "last")
-            if current_price is not None and last_price is not None:
-                return company, (
-                    (current_price * holding_pct) / 100,
-                    (last_price * holding_pct) / 100
-                )
+            candidates.append((ticker_and_exchange[1], "BOM"))
+        return candidates
+
+    def _live_candidates(self, ticker_and_exchange):
+        """Quote candidates minus listings the negative cache is holding back"""
+        candidates = []
+        for ticker, exchange in self._quote_candidates(ticker_and_exchange):
+            if self.negative_cache.should_skip(ticker, exchange):
+                TRACER.count('quote.negative_skip')
+            else:
+                candidates.append((ticker, exchange))
+        return candidates
+
+    def _fetch_company_prices(self, company, hedge_executor=None):
+        """Helper method for parallel execution, returns (company, quote or None)"""
+        ticker_and_exchange = self.companies_ticker_and_Exchange_of_this_particular_MF[company]
         
+        candidates = self._live_candidates(ticker_and_exchange)
+        if not candidates:
+            return company, None
+
+        if hedge_executor is not None and len(candidates) > 1:
+            quote = hedged_fetch(hedge_executor, self._get_quote, candidates, self.hedge_delay)
+            if quote is not None:
+                return company, quote
+        else:
+            # Try NSE first, fall back to BSE
+            for ticker, exchange in candidates:
+                quote = self._get_quote(ticker, exchange)
+                if quote is not None and quote.is_complete():
+                    return company, quote
+
+        # While the quote host is refusing requests, fall back to the last price seen
+        quote = stale_quote(self.quote_cache, self.http, candidates, self.eod_source)
+        if quote is not None:
+            return company, quote
         print(f"Skipping company with tickers: {ticker_and_exchange}")
-        return company, (0, 0)
-
-    def calculate_current_status(self):
-        """Calculate current MF status with dynamic parallel workers"""
-        cummulative_current = 0
-        cummulative_last = 0
+        return company, None
 
-        with ThreadPoolExecutor(max_workers=self.dynamic_workers) as executor:
-            futures = {
-                executor.submit(self._fetch_company_prices, company): company
+    def _register_with_engine(self):
+        """Register this fund's holdings with the NAV engine once per holdings snapshot"""
+        if self._engine_registration == (self.holdings_hash, self.Last_day_closed, self.equity_portion):
+            return
+        self.nav_engine.add_fund(
+            self.fund_name,
+            [
+                (company, self.stock_search_company_name_stock_correcponding_holding_pairs[company])
                 for company in self.stock_search_company_name_char_str
-            }
-            
-            for future in as_completed(futures):
-                company, (current, last) = future.result()
-                cummulative_current += current
-                cummulative_last += last
-
-        if cummulative_last == 0:
-            return 0
+            ],
+            self.Last_day_closed,
+            self.equity_portion
+        )
+        self._engine_registration = (self.holdings_hash, self.Last_day_closed, self.equity_portion)
 
-        return ((cummulative_current - cummulative_last) / cummulative_last) * 100
+    def push_quotes(self, quotes):
+        """Push quotes into the NAV engine; returns every fund whose inputs changed
 
-    def run_analysis(self, iterations=2):
-        """Run the analysis with tracking and comparison"""
-        print(f"\nAnalyzing: {self.fund_name}")
-
-        # Time thresholds
-        market_open = time_class(9, 15)
-        market_close = time_class(15, 30)
-        current_time = datetime.now().time()
-        today = date.today().strftime("%d/%m/%Y")
+        Holdings are shared between funds, so one fund's quotes can move
+        others that hold the same companies.
+        """
+        self._register_with_engine()
+        return self.nav_engine.update_prices({
+            company: (quote.current_price, quote.previous_close) if quote is not None else None
+            for company, quote in quotes.items()
+        })
+
+    def apply_quotes(self, quotes):
+        """Push quotes into the NAV engine; returns True if any of this fund's inputs changed"""
+        return self.fund_name in self.push_quotes(quotes)
+
+    def _percent_change_from_quotes(self, quotes):
+        """Load quotes into the NAV engine and evaluate this fund's percent change"""
+        self.apply_quotes(quotes)
+        return self.nav_engine.percent_change(self.fund_name)
+
+    def _eod_quotes(self, session):
+        """Quotes for holdings the bhavcopy of a settled session covers"""
+        quotes = {}
+        for company in self.stock_search_company_name_char_str:
+            ticker_and_exchange = self.companies_ticker_and_Exchange_of_this_particular_MF[company]
+            for ticker, exchange in self._quote_candidates(ticker_and_exchange):
+                quote = self.eod_source.session_quote(ticker, exchange, session)
+                if quote is not None:
+                    quotes[company] = quote
+                    break
+        return quotes
+
+    def _with_eod_previous_close(self, quotes, today):
+        """Replace live previous closes with the last bhavcopy close before today"""
+        if today is None:
+            return quotes
+        adjusted = {}
+        for company, quote in quotes.items():
+            previous_close = None
+            if quote is not None and quote.current_price is not None:
+                previous_close = self.eod_source.previous_close(quote.ticker, quote.exchange, today)
+            if previous_close is not None:
+                # Cached quotes are shared between funds, so copy rather than modify
+                quote = Quote(quote.ticker, quote.exchange, quote.current_price, previous_close,
+                              quote.currency, quote.timestamp)
+            adjusted[company] = quote
+        return adjusted
+
+    def fetch_quotes(self):
+        """Fetch a quote (or None) for every holding
+
+        Holdings covered by the bhavcopy of a settled session are priced
+        offline; the rest use the configured execution engine.
+        """
+        started = time_module.monotonic()
+        now = datetime.now()
+        session = settled_session(now, MARKET_OPEN, MARKET_CLOSE)
+        quotes = self._eod_quotes(session) if session is not None else {}
+        live = [company for company in self.stock_search_company_name_char_str if company not in quotes]
+        TRACER.count('quote_source.eod', len(quotes))
+        TRACER.count('quote_source.live', len(live))
+        if not live:
+            return quotes
+
+        fetch = self._fetch_quotes_async if self.execution_mode == "async" else self._fetch_quotes_threaded
+        # Live prices are today's only during and after today's session
+        today = now.date() if session is None or session == now.date() else None
+        if self.deadline is None:
+            quotes.update(self._with_eod_previous_close(fetch(live), today))
+        else:
+            remaining = max(0.0, self.deadline - (time_module.monotonic() - started))
+            if self._quote_worker is not None and self._quote_worker.is_alive():
+                # Let the previous fetch finish rather than run two at once
+                self._quote_worker.join(remaining)
+                if self._quote_worker.is_alive():
+                    print("Previous quote fetch still running - skipping this fetch")
+                    TRACER.count('quote.fetch_overlap')
+                    return quotes
+                remaining = max(0.0, self.deadline - (time_module.monotonic() - started))
+            quotes.update(self._fetch_quotes_by_deadline(fetch, live, today, remaining))
+        self.negative_cache.save()
+        return quotes
+
+    def _fetch_quotes_by_deadline(self, fetch, companies, today, timeout):
+        """Return the quotes that arrive within `timeout` seconds
+
+        The fetch keeps running in the background. Holdings still missing at
+        the deadline are recorded as late for this fund only; the NAV engine
+        is left alone because its prices are shared with other funds. Each
+        late quote is applied to the engine on arrival, so refine() or the
+        next evaluation sees the fuller estimate.
+        """
+        arrived = {}
+        deadline_passed = threading.Event()
+        condition = threading.Condition()
+        with self._late_lock:
+            self._late = set()
+
+        def on_quote(company, quote):
+            quote = self._with_eod_previous_close({company: quote}, today)[company]
+            with condition:
+                arrived[company] = quote
+                if deadline_passed.is_set():
+                    changed = self.push_quotes({company: quote})
+                    with self._late_lock:
+                        self._late.discard(company)
+                        self._late_changed |= changed
+                    TRACER.count('quote.late')
+                condition.notify_all()
+
+        self._quote_worker = threading.Thread(target=fetch, args=(companies, on_quote), daemon=True)
+        self._quote_worker.start()
+        with condition:
+            condition.wait_for(lambda: len(arrived) == len(companies), timeout=timeout)
+            missing = [company for company in companies if company not in arrived]
+            if missing:
+                print(f"Deadline of {self.deadline}s reached with {len(missing)} holdings outstanding")
+                TRACER.count('quote.deadline_missing', len(missing))
+                with self._late_lock:
+                    self._late = set(missing)
+                deadline_passed.set()
+            return dict(arrived)
+
+    def refine(self, timeout=None):
+        """Wait for quotes that missed the deadline and return the updated percent change"""
+        if self._quote_worker is not None:
+            self._quote_worker.join(timeout)
+            self.negative_cache.save()
+        percent_change = self.nav_engine.percent_change(self.fund_name)
+        self._update_coverage()
+        return percent_change
+
+    def pop_late_changes(self):
+        """Funds whose NAV inputs late quotes changed since the last call"""
+        with self._late_lock:
+            changed, self._late_changed = self._late_changed, set()
+        return changed
+
+    def _update_coverage(self):
+        """Share of holdings (by corpus_per) that is priced, and the unpriced holdings
+
+        Holdings that missed the deadline count as missing even if the NAV
+        engine still has an older price for them.
+        """
+        with self._late_lock:
+            late = set(self._late)
+        priced, total = self.nav_engine.coverage(self.fund_name, exclude=late)
+        unpriced = set(self.nav_engine.unpriced(self.fund_name))
+        self.coverage = priced / total if total else 0.0
+        self.missing_holdings = [
+            company for company in self.stock_search_company_name_char_str
+            if company in late or company in unpriced
+        ]
 
-        # 1. First handle yesterday's official NAV update
+    def calculate_current_status(self):
+        """Calculate current MF status using the configured execution engine"""
+        return self._percent_change_from_quotes(self.fetch_quotes())
+
+    def _fetch_quotes_threaded(self, companies, on_quote=None):
+        """Fetch quotes with dynamic parallel workers, calling on_quote(company, quote) as each arrives"""
+        quotes = {}
+
+        # Hedged lookups run on their own pool so holding workers never wait
+        # on tasks queued behind themselves. Losing requests are not waited for.
+        # The pool belongs to this call, since a deadline fetch may still be
+        # running in the background when the next one starts.
+        hedge_executor = None
+        if self.hedge_delay is not None:
+            hedge_executor = ThreadPoolExecutor(max_workers=self.dynamic_workers * 2)
+        try:
+            with ThreadPoolExecutor(max_workers=self.dynamic_workers) as executor:
+                futures = {
+                    executor.submit(self._fetch_company_prices, company, hedge_executor): company
+                    for company in companies
+                }
+                
+                for future in as_completed(futures):
+                    company, quote = future.result()
+                    quotes[company] = quote
+                    if on_quote is not None:
+                        on_quote(company, quote)
+        finally:
+            if hedge_executor is not None:
+                hedge_executor.shutdown(wait=False, cancel_futures=True)
+
+        return quotes
+
+    def _fetch_quotes_async(self, companies, on_quote=None):
+        """Fetch quotes with all requests on one event loop"""
+        jobs = {
+            company: self._live_candidates(self.companies_ticker_and_Exchange_of_this_particular_MF[company])
+            for company in companies
+        }
+        # aiohttp is only imported for async runs
+        from async_engine import AsyncQuoteEngine
+        engine = AsyncQuoteEngine(self.async_concurrency, self.http, self.quote_cache, self.hedge_delay,
+                                  self.negative_cache, self.eod_source)
+        quotes = engine.fetch_all(jobs, on_quote)
+
+        for company, quote in quotes.items():
+            if quote is None and jobs[company]:
+                print(f"Skipping company with tickers: {self.companies_ticker_and_Exchange_of_this_particular_MF[company]}")
+
+        return quotes
+
+    def equity_adjusted_nav(self, percent_change):
+        """Scale the percent change of the equity book by the equity portion"""
+        equity_adjusted_nav = self.Last_day_closed * (1 + (percent_change * self.equity_portion) / 100)
+        return round(equity_adjusted_nav, 4)
+
+    def _summary(self, status, calculated_nav=None, percent_change=None, stored=False):
+        return {
+            'fund_name': self.fund_name,
+            'status': status,
+            'last_nav': self.Last_day_closed,
+            'calculated_nav': calculated_nav,
+            'percent_change': percent_change,
+            'equity_portion': self.equity_portion,
+            'stored': stored,
+            'coverage': self.coverage,
+            'missing': list(self.missing_holdings),
+        }
+
+    def update_previous_official_nav(self):
+        """Fill in yesterday's official NAV if it has not been recorded yet"""
         prev_calc = self.sheet_manager.get_previous_calculation(self.fund_name)
         if prev_calc and (prev_calc['official_nav'] is None or prev_calc['official_nav'] == ''):
             official_nav = self.fetch_official_nav()
@@ -487,32 +599,25 @@ class MutualFundAnalyzer:
                 self.sheet_manager.update_official_nav(self.fund_name, official_nav)
                 print(f"Updated yesterday's official NAV to {official_nav}")
 
-        # 2. Fetch current data and calculate NAV
-        if not self.fetch_mf_data():
-            print("Failed to fetch mutual fund data")
-            return
-
-        percent_change = self.calculate_current_status()
-        if percent_change is None:
-            print("Error: Could not calculate percentage change")
-            return
-
-        print(f"\nLast Day Closed NAV: {self.Last_day_closed}")
-
-        equity_adjusted_nav = self.Last_day_closed * (1 + (percent_change * self.equity_portion) / 100)
-        rounded_nav = round(equity_adjusted_nav, 4)
+    def store_calculation(self, rounded_nav, current_time, today):
+        """Queue a record for today's calculation if the time-of-day rules allow it
 
-        print("\nCalculation Results:")
-        print(f"Current NAV (equity-adjusted): {rounded_nav:.4f}")
-        print(f"Calculation Time: {current_time}")
+        Returns True when a record was added or updated. Deadline runs that
+        priced too little of the fund are not stored, so a partial estimate
+        never becomes the day's closing NAV.
+        """
+        if self.deadline is not None:
+            self._update_coverage()
+            if self.coverage < MIN_STORE_COVERAGE:
+                print(f"Coverage {self.coverage:.1%} below {MIN_STORE_COVERAGE:.0%} - not storing estimate")
+                return False
 
-        # 3. Determine if we should store this calculation
         should_store = False
         existing_today = self.sheet_manager.get_todays_record(self.fund_name, today)
 
-        if current_time < market_open:
+        if current_time < MARKET_OPEN:
             print("Before market open - not storing data")
-        elif current_time <= market_close:
+        elif current_time <= MARKET_CLOSE:
             # Market hours - only store if different from existing
             if not existing_today:
                 should_store = True
@@ -520,7 +625,7 @@ class MutualFundAnalyzer:
             else:
                 # Compare NAV values
                 existing_nav = float(existing_today['calculated_nav'])
-                if abs(existing_nav - rounded_nav) > 0.0001:
+                if abs(existing_nav - rounded_nav) > NAV_CHANGE_THRESHOLD:
                     should_store = True
                     reason = "Significant NAV change"
                 else:
@@ -535,7 +640,7 @@ class MutualFundAnalyzer:
                 existing_time_str = existing_today['calculation_time']
                 try:
                     existing_time = datetime.strptime(existing_time_str, "%H:%M:%S").time()
-                    if existing_time < market_close:
+                    if existing_time < MARKET_CLOSE:
                         should_store = True
                         reason = "Market close recording"
                     else:
@@ -545,48 +650,105 @@ class MutualFundAnalyzer:
                     should_store = True
                     reason = "Invalid existing time format"
 
-        # 4. Store the record if needed
-        if should_store:
-            new_record = {
-                'date': today,
-                'calculation_time': current_time.strftime("%H:%M:%S"),
-                'calculated_nav': rounded_nav,
-                'official_nav': '',
-                'difference': '',
-                'percentage_diff': '',
-                'fund_name': self.fund_name,
-                'equity_portion': self.equity_portion
-            }
-            try:
-                if existing_today:
-                    # Update existing record
-                    self.sheet_manager.update_record(self.fund_name, existing_today['row_num'], new_record)
-                    print(f"✓ Updated today's record ({reason})")
-                else:
-                    # Add new record
-                    self.sheet_manager.add_record(self.fund_name, new_record)
-                    print(f"✓ Added new record ({reason})")
-            except Exception as e:
-                print(f"Failed to update sheet: {str(e)}")
+        if not should_store:
+            return False
+
+        new_record = {
+            'date': today,
+            'calculation_time': current_time.strftime("%H:%M:%S"),
+            'calculated_nav': rounded_nav,
+            'official_nav': '',
+            'difference': '',
+            'percentage_diff': '',
+            'fund_name': self.fund_name,
+            'equity_portion': self.equity_portion
+        }
+        try:
+            if existing_today:
+                # Update existing record
+                self.sheet_manager.update_record(self.fund_name, existing_today['row_num'], new_record)
+                print(f"✓ Updated today's record ({reason})")
+            else:
+                # Add new record
+                self.sheet_manager.add_record(self.fund_name, new_record)
+                print(f"✓ Added new record ({reason})")
+        except Exception as e:
+            print(f"Failed to update sheet: {str(e)}")
+            return False
+        return True
+
+    def _stage(self, name):
+        """Trace span for one stage of this fund's run"""
+        return TRACER.span(f'stage.{name}', fund=self.fund_name)
+
+    def run_analysis(self, iterations=2):
+        """Run the analysis with tracking and comparison, returning a summary dict"""
+        with TRACER.span('run_analysis', fund=self.fund_name) as span:
+            summary = self._run_stages()
+            span['status'] = summary['status']
+        return summary
+
+    def _run_stages(self):
+        print(f"\nAnalyzing: {self.fund_name}")
+
+        current_time = datetime.now().time()
+        today = date.today().strftime("%d/%m/%Y")
+
+        # 1. First handle yesterday's official NAV update
+        with self._stage('official_nav'):
+            self.update_previous_official_nav()
+
+        # 2. Fetch current data and calculate NAV
+        with self._stage('fetch_mf_data'):
+            fetched = self.fetch_mf_data()
+        if not fetched:
+            print("Failed to fetch mutual fund data")
+            return self._summary("fetch_failed")
+
+        with self._stage('quotes') as span:
+            percent_change = self.calculate_current_status()
+            span['holdings'] = len(self.stock_search_company_name_char_str)
+        if percent_change is None:
+            print("Error: Could not calculate percentage change")
+            return self._summary("calculation_failed")
+
+        self._update_coverage()
+        if (self.refine_wait and self.coverage < MIN_STORE_COVERAGE
+                and self._quote_worker is not None and self._quote_worker.is_alive()):
+            print(f"Coverage {self.coverage:.1%} - waiting up to {self.refine_wait}s more for late quotes")
+            with self._stage('refine'):
+                percent_change = self.refine(self.refine_wait)
+        print(f"\nLast Day Closed NAV: {self.Last_day_closed}")
+        print(f"Coverage: {self.coverage:.1%} of holdings by weight")
+        if self.missing_holdings:
+            print(f"Missing ({len(self.missing_holdings)}): {', '.join(self.missing_holdings)}")
+
+        rounded_nav = self.equity_adjusted_nav(percent_change)
+
+        print("\nCalculation Results:")
+        print(f"Current NAV (equity-adjusted): {rounded_nav:.4f}")
+        print(f"Calculation Time: {current_time}")
+
+        # 3. Store the calculation if the time-of-day rules allow it
+        with self._stage('store'):
+            stored = self.store_calculation(rounded_nav, current_time, today)
+
+        # 4. Send queued sheet writes in one batch
+        try:
+            with self._stage('flush'):
+                self.sheet_manager.flush()
+        except Exception as e:
+            print(f"Failed to update sheet: {str(e)}")
 
         # 5. Show historical comparison
         self.sheet_manager.show_comparison(self.fund_name)
 
+        return self._summary("ok", rounded_nav, percent_change, stored)
+
     def fetch_official_nav(self):
         """Fetch the official NAV from Groww"""
         try:
-            response = requests.get(self.url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            script_content = soup.find('script', {'id': "__NEXT_DATA__"})
-            script_content = script_content.text
-            nav_element_start = script_content.find('"nav":')
-            nav_element = script_content[nav_element_start+6:nav_element_start+11]
-
-            if nav_element:
-                return float(nav_element.strip().replace(",",""))
-            
+            return self._load_fund_page().nav
         except Exception as e:
             print(f"Error fetching official NAV: {str(e)}")
         return None
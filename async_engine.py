@@ -0,0 +1,233 @@
+import asyncio
+import time
+from urllib.parse import urlparse
+import aiohttp
+from instrumentation import TRACER
+from http_client import get_http_client, BlockedResponseError, CircuitOpenError, RETRY_STATUSES, THROTTLE_STATUSES
+from quotes import (
+    GOOGLE_FINANCE_QUOTE_URL, SHARED_QUOTE_CACHE, is_blocked_page, listing_failure_reason, parse_quote_page,
+    record_quote_result, stale_quote
+)
+
+DEFAULT_CONCURRENCY = 50
+
+
+class AsyncQuoteEngine:
+    """Fetches quotes for many holdings on one event loop
+
+    Concurrency is bounded by a semaphore instead of a thread per request, so
+    hundreds of quote pages can be in flight at once. Rate limits, retry
+    policy and the quote cache are shared with the threaded path.
+    """
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, http=None, quote_cache=None, hedge_delay=None,
+                 negative_cache=None, eod_source=None):
+        self.concurrency = concurrency
+        self.hedge_delay = hedge_delay
+        self.http = http if http is not None else get_http_client()
+        self.quote_cache = quote_cache if quote_cache is not None else SHARED_QUOTE_CACHE
+        self.negative_cache = negative_cache
+        # Supplies last closes for holdings while the quote host is unavailable
+        self.eod_source = eod_source
+
+    async def _acquire_slot(self, limiter):
+        # The limiter is shared with worker threads, so wait for its release
+        # signal on this loop instead of blocking the loop on its lock
+        loop = asyncio.get_running_loop()
+        while True:
+            waiter = limiter.acquire_or_wait(loop)
+            if waiter is None:
+                return
+            await waiter
+
+    async def _acquire_request(self):
+        # The client's global in-flight cap is shared with worker threads too
+        loop = asyncio.get_running_loop()
+        while True:
+            waiter = self.http.acquire_request_or_wait(loop)
+            if waiter is None:
+                return
+            await waiter
+
+    async def _send(self, session, host, limiter, url):
+        """One attempt while holding a slot of the host's adaptive limit"""
+        await self._acquire_slot(limiter)
+        started = time.perf_counter()
+        latency, congested = None, False
+        try:
+            await self._acquire_request()
+            try:
+                async with session.get(url) as response:
+                    text = await response.text()
+            finally:
+                self.http.release_request()
+            if response.status in THROTTLE_STATUSES:
+                congested = True
+            elif response.status < 500:
+                latency = time.perf_counter() - started
+            return response, text
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            congested = True
+            raise
+        finally:
+            TRACER.gauge(f'concurrency_limit.{host}', limiter.release(latency, congested))
+
+    async def _download(self, session, url, is_blocked=None):
+        """GET url honouring the shared per-host rate limits, adaptive concurrency, retry policy and circuit breaker"""
+        host = urlparse(url).hostname or ''
+        breaker = self.http.breaker_for(host)
+        if not breaker.allow():
+            TRACER.count('http.circuit_rejected')
+            raise CircuitOpenError(f"Circuit open for {host}")
+        try:
+            text = await self._download_text(session, host, url)
+        except aiohttp.ClientResponseError as e:
+            if e.status in RETRY_STATUSES:
+                self.http.report_failure(host, f"HTTP {e.status}")
+            else:
+                breaker.record_success()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.http.report_failure(host, 'connection errors')
+            raise
+        except asyncio.CancelledError:
+            # A cancelled probe says nothing about the host; let the next request probe
+            breaker.record_cancelled()
+            raise
+        if is_blocked is not None and is_blocked(url, text):
+            self.http.report_failure(host, 'block page')
+            raise BlockedResponseError(f"{host} served a block page")
+        breaker.record_success()
+        return text
+
+    async def _download_text(self, session, host, url):
+        bucket = self.http.bucket_for(host)
+        limiter = self.http.limiter_for(host)
+        with TRACER.span('http.request', host=host, path=urlparse(url).path, engine='async') as span:
+            for attempt in range(self.http.max_retries + 1):
+                span['retries'] = attempt
+                if bucket is not None:
+                    delay = bucket.reserve()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                retry_after = None
+                try:
+                    response, text = await self._send(session, host, limiter, url)
+                    if response.status not in RETRY_STATUSES or attempt == self.http.max_retries:
+                        span['status'] = response.status
+                        span['limit'] = int(limiter.limit)
+                        response.raise_for_status()
+                        span['bytes'] = len(text)
+                        return text
+                    retry_after = response.headers.get('Retry-After')
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt == self.http.max_retries:
+                        raise
+                await asyncio.sleep(self.http.backoff_delay(attempt, retry_after))
+
+    async def _fetch_quote(self, session, ticker, exchange):
+        found, quote = self.quote_cache.get(ticker, exchange)
+        if found:
+            self.quote_cache.record_lookup('hit')
+            TRACER.record('quote', 0.0, ticker=ticker, exchange=exchange, cache='hit')
+            return quote
+
+        # Coalesce concurrent requests for the same listing on this loop. The
+        # download is shielded so one waiter being cancelled (a hedge loser)
+        # only aborts it when nobody else is waiting for it.
+        key = (ticker, exchange)
+        entry = self._in_flight.get(key)
+        outcome = 'coalesced' if entry is not None else 'miss'
+        self.quote_cache.record_lookup(outcome)
+        if entry is None:
+            entry = [asyncio.ensure_future(self._download_quote(session, ticker, exchange)), 0]
+            self._in_flight[key] = entry
+        entry[1] += 1
+        try:
+            with TRACER.span('quote', ticker=ticker, exchange=exchange, cache=outcome):
+                return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not entry[0].done():
+                entry[0].cancel()
+                self._in_flight.pop(key, None)
+            raise
+        finally:
+            entry[1] -= 1
+
+    async def _download_quote(self, session, ticker, exchange):
+        quote = None
+        reason = 'no price on page'
+        async with self._semaphore:
+            try:
+                url = GOOGLE_FINANCE_QUOTE_URL.format(ticker=ticker, exchange=exchange)
+                html = await self._download(session, url, is_blocked_page)
+                quote = parse_quote_page(html, ticker, exchange)
+            except (CircuitOpenError, BlockedResponseError):
+                # Not cached, so the listing is retried once the host recovers
+                return None
+            except Exception as e:
+                print(f"Error getting quote for {ticker} on {exchange}: {str(e)}")
+                reason = listing_failure_reason(e)
+        record_quote_result(self.negative_cache, self.http, ticker, exchange, quote, reason)
+        self.quote_cache.put(ticker, exchange, quote)
+        return quote
+
+    async def fetch_first_complete(self, session, candidates):
+        """Try (ticker, exchange) candidates in order and return the first complete quote"""
+        for ticker, exchange in candidates:
+            quote = await self._fetch_quote(session, ticker, exchange)
+            if quote is not None and quote.is_complete():
+                return quote
+        return None
+
+    async def fetch_hedged(self, session, candidates, delay):
+        """Race candidates like quotes.hedged_fetch and cancel the losing requests"""
+        remaining = list(candidates)
+        pending = set()
+
+        def launch():
+            pending.add(asyncio.ensure_future(self._fetch_quote(session, *remaining.pop(0))))
+
+        launch()
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=delay if remaining else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                quote = task.result()
+                if quote is not None and quote.is_complete():
+                    for loser in pending:
+                        loser.cancel()
+                    return quote
+            if remaining and (not done or not pending):
+                launch()
+        return None
+
+    async def _fetch_holding(self, session, key, candidates, on_quote):
+        if self.hedge_delay is not None and len(candidates) > 1:
+            quote = await self.fetch_hedged(session, candidates, self.hedge_delay)
+        else:
+            quote = await self.fetch_first_complete(session, candidates)
+        if quote is None:
+            quote = stale_quote(self.quote_cache, self.http, candidates, self.eod_source)
+        if on_quote is not None:
+            on_quote(key, quote)
+        return quote
+
+    async def _fetch_all(self, jobs, on_quote=None):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._in_flight = {}
+        timeout = aiohttp.ClientTimeout(total=self.http.timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            keys = list(jobs)
+            quotes = await asyncio.gather(*(
+                self._fetch_holding(session, key, jobs[key], on_quote) for key in keys
+            ))
+        return dict(zip(keys, quotes))
+
+    def fetch_all(self, jobs, on_quote=None):
+        """Resolve {key: [(ticker, exchange), ...]} into {key: Quote or None}
+
+        on_quote(key, quote), if given, is called as each holding resolves.
+        """
+        return asyncio.run(self._fetch_all(jobs, on_quote))
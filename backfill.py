@@ -0,0 +1,310 @@
+"""Historical backfill of estimated vs. official NAVs
+
+Replays the NAV estimate for every trading day in a date range from a local
+file of closing prices instead of scraping quotes day by day:
+
+    python backfill.py --start 2026-07-01 --end 2026-09-30 --prices closes.csv \
+        --official-navs navs.csv --store sqlite
+
+The price file is a CSV with one closing price per row. NSE bhavcopies
+(SYMBOL, SERIES, CLOSE, TIMESTAMP) can be concatenated as-is; any file with
+date, ticker/symbol and close columns works too, with NSE symbols or BSE
+codes as tickers. The official NAV file has fund_name, date and nav columns.
+Current holdings are used for every day in the range.
+"""
+import argparse
+import csv
+import hashlib
+import os
+from datetime import datetime
+import numpy as np
+from MutualFundAnalyzer import MutualFundAnalyzer, MARKET_CLOSE
+from bhavcopy import (
+    parse_date, find_column, field, save_npz, DATE_COLUMNS, TICKER_COLUMNS, CLOSE_COLUMNS, SERIES_COLUMNS, EQUITY_SERIES
+)
+from local_store import open_store, STORE_BACKENDS
+from portfolio_runner import load_fund_config
+from record_store import DATE_FORMAT
+from snapshot_store import DEFAULT_CACHE_DIR
+
+# Backfilled rows are closing estimates, stamped with the market close time
+BACKFILL_TIME = MARKET_CLOSE.strftime("%H:%M:%S")
+
+
+class PriceHistory:
+    """Closing prices as a dates x tickers NumPy matrix (NaN where not traded)
+
+    Parsed CSVs are cached as .npz files keyed by the source file's size and
+    mtime, so repeated backfills skip the CSV parse.
+    """
+    def __init__(self, dates, tickers, closes):
+        self.dates = dates  # sorted datetime.date
+        self.tickers = {ticker: column for column, ticker in enumerate(tickers)}
+        self.closes = closes
+
+    @classmethod
+    def _read_csv(cls, path):
+        prices = {}  # (date, ticker) -> close
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            fieldnames = reader.fieldnames or []
+            date_col = find_column(fieldnames, DATE_COLUMNS)
+            ticker_col = find_column(fieldnames, TICKER_COLUMNS)
+            close_col = find_column(fieldnames, CLOSE_COLUMNS)
+            series_col = find_column(fieldnames, SERIES_COLUMNS)
+            if not (date_col and ticker_col and close_col):
+                raise ValueError(f"{path} needs date, ticker and close columns")
+
+            for row in reader:
+                if series_col and field(row, series_col).upper() not in EQUITY_SERIES:
+                    continue
+                ticker = field(row, ticker_col)
+                if not ticker:
+                    continue
+                try:
+                    prices[(parse_date(field(row, date_col)), ticker)] = float(field(row, close_col))
+                except (ValueError, TypeError):
+                    continue
+
+        dates = sorted({day for day, _ in prices})
+        tickers = sorted({ticker for _, ticker in prices})
+        rows = {day: i for i, day in enumerate(dates)}
+        columns = {ticker: i for i, ticker in enumerate(tickers)}
+        closes = np.full((len(dates), len(tickers)), np.nan)
+        for (day, ticker), close in prices.items():
+            closes[rows[day], columns[ticker]] = close
+        return cls(dates, tickers, closes)
+
+    @classmethod
+    def load(cls, path, cache_dir=DEFAULT_CACHE_DIR):
+        stat = os.stat(path)
+        key = hashlib.sha256(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+        cache_path = os.path.join(cache_dir, 'prices', f"{key.hexdigest()[:16]}.npz")
+
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as data:
+                    dates = [datetime.strptime(d, "%Y-%m-%d").date() for d in data['dates']]
+                    return cls(dates, [str(ticker) for ticker in data['tickers']], data['closes'])
+            except Exception as e:
+                print(f"Warning: Re-reading price history {path}, cached copy is unreadable ({str(e)})")
+
+        history = cls._read_csv(path)
+        try:
+            save_npz(
+                cache_path,
+                dates=np.array([d.isoformat() for d in history.dates]),
+                tickers=np.array(list(history.tickers)),
+                closes=history.closes,
+            )
+        except OSError as e:
+            print(f"Warning: Could not cache price history ({str(e)})")
+        return history
+
+    def column_for(self, ticker_and_exchange):
+        """Price column for a holding's [nse_symbol, bse_code], NSE first"""
+        for ticker in ticker_and_exchange:
+            column = self.tickers.get(str(ticker))
+            if column is not None:
+                return column
+        return None
+
+    def window(self, start, end):
+        """Row indices of trading days in [start, end] plus the day before, for returns"""
+        rows = [i for i, day in enumerate(self.dates) if start <= day <= end]
+        if rows and rows[0] > 0:
+            rows.insert(0, rows[0] - 1)
+        return rows
+
+
+def load_official_navs(path):
+    """Read {fund_name: {date: nav}} from a CSV with fund_name, date and nav columns"""
+    navs = {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): value for key, value in row.items()}
+            try:
+                navs.setdefault(row['fund_name'].strip(), {})[parse_date(row['date'])] = float(row['nav'])
+            except (KeyError, ValueError):
+                continue
+    return navs
+
+
+def percent_changes(closes, weights):
+    """Daily weighted percent change for every fund, as a (days - 1) x funds matrix
+
+    Mirrors NavEngine: for each day the weighted sum of closes is compared
+    with the weighted sum of the previous closes, counting only holdings
+    priced on both days.
+    """
+    current, previous = closes[1:], closes[:-1]
+    priced = ~(np.isnan(current) | np.isnan(previous))
+    current_sums = np.where(priced, current, 0.0) @ weights.T
+    previous_sums = np.where(priced, previous, 0.0) @ weights.T
+
+    changes = np.full(current_sums.shape, np.nan)
+    nonzero = previous_sums != 0
+    changes[nonzero] = (current_sums[nonzero] - previous_sums[nonzero]) / previous_sums[nonzero] * 100
+    return changes
+
+
+class Backfill:
+    """Computes and stores calculated vs. official NAVs for a date range"""
+    def __init__(self, analyzers, prices, store, official_navs=None, overwrite=False):
+        self.analyzers = analyzers
+        self.prices = prices
+        self.store = store
+        self.official_navs = official_navs or {}
+        self.overwrite = overwrite
+
+    def _weights(self):
+        """funds x tickers weight matrix from each analyzer's current holdings"""
+        weights = np.zeros((len(self.analyzers), len(self.prices.tickers)))
+        coverage = []
+        for row, analyzer in enumerate(self.analyzers):
+            holdings = analyzer.stock_search_company_name_stock_correcponding_holding_pairs
+            covered = 0.0
+            for company, corpus_per in holdings.items():
+                column = self.prices.column_for(analyzer.companies_ticker_and_Exchange_of_this_particular_MF[company])
+                if column is not None and corpus_per:
+                    weights[row, column] += corpus_per / 100
+                    covered += corpus_per
+            total = sum(corpus_per or 0 for corpus_per in holdings.values())
+            coverage.append(covered / total if total else 0.0)
+        return weights, coverage
+
+    def _official_navs(self, analyzer):
+        """Official NAVs from the NAV file, falling back to ones already stored"""
+        navs = {}
+        for record in self.store.get_all_records(analyzer.fund_name):
+            if record['official_nav'] not in (None, ''):
+                navs[datetime.strptime(record['date'], DATE_FORMAT).date()] = float(record['official_nav'])
+        navs.update(self.official_navs.get(analyzer.fund_name, {}))
+        return navs
+
+    def _records(self, analyzer, days, changes, official):
+        """Chain each day's estimate off the previous official NAV (or estimate when missing)"""
+        records = []
+        previous_nav = official.get(days[0])
+        for day, change in zip(days[1:], changes):
+            if previous_nav is not None and not np.isnan(change):
+                calculated = round(previous_nav * (1 + (change * analyzer.equity_portion) / 100), 4)
+                record_date = day.strftime(DATE_FORMAT)
+                existing = self.store.get_record(analyzer.fund_name, record_date)
+
+                if existing is not None and existing['calculated_nav'] not in (None, '') and not self.overwrite:
+                    record = {field: existing[field] for field in self.store.FIELD_NAMES}
+                else:
+                    record = {
+                        'date': record_date,
+                        'calculation_time': BACKFILL_TIME,
+                        'calculated_nav': calculated,
+                        'official_nav': '',
+                        'difference': '',
+                        'percentage_diff': '',
+                        'fund_name': analyzer.fund_name,
+                        'equity_portion': analyzer.equity_portion,
+                    }
+                if day in official:
+                    self.store._fill_official_nav(record, official[day])
+                records.append(record)
+            else:
+                calculated = None
+            previous_nav = official.get(day, calculated)
+        return records
+
+    def _tracking(self, analyzer, days, changes, official):
+        """Tracking error of the estimate and the equity portion that best fits official returns"""
+        estimated, actual = [], []
+        for previous_day, day, change in zip(days, days[1:], changes):
+            if previous_day in official and day in official and not np.isnan(change):
+                estimated.append(change)
+                actual.append((official[day] / official[previous_day] - 1) * 100)
+        if not estimated:
+            return {'days': 0, 'tracking_error': None, 'fitted_equity_portion': None}
+
+        estimated, actual = np.array(estimated), np.array(actual)
+        errors = actual - estimated * analyzer.equity_portion
+        fitted = float(estimated @ actual / (estimated @ estimated)) if estimated.any() else None
+        return {
+            'days': len(estimated),
+            'tracking_error': float(np.sqrt(np.mean(errors ** 2))),
+            'fitted_equity_portion': fitted,
+        }
+
+    def run(self, start, end):
+        """Backfill every fund for trading days in [start, end] and return one summary per fund"""
+        rows = self.prices.window(start, end)
+        if len(rows) < 2:
+            print("Not enough trading days in the price file for this range")
+            return []
+
+        days = [self.prices.dates[i] for i in rows]
+        weights, coverage = self._weights()
+        changes = percent_changes(self.prices.closes[rows], weights)
+
+        summaries = []
+        for i, analyzer in enumerate(self.analyzers):
+            official = self._official_navs(analyzer)
+            records = self._records(analyzer, days, changes[:, i], official)
+            if records:
+                self.store.bulk_upsert(analyzer.fund_name, records)
+            summaries.append(dict(
+                {'fund_name': analyzer.fund_name, 'records': len(records), 'coverage': coverage[i],
+                 'equity_portion': analyzer.equity_portion},
+                **self._tracking(analyzer, days, changes[:, i], official)
+            ))
+        self.store.flush()
+        return summaries
+
+
+def print_backfill_summary(summaries):
+    print("\nBackfill Summary:")
+    print("{:<45} {:>8} {:>9} {:>8} {:>12} {:>10}".format(
+        'Fund', 'Records', 'Coverage', 'Equity', 'Track Err %', 'Fitted'))
+    print("-" * 97)
+    for summary in summaries:
+        print("{:<45} {:>8} {:>8.1f}% {:>8.3f} {:>12} {:>10}".format(
+            summary['fund_name'],
+            summary['records'],
+            summary['coverage'] * 100,
+            summary['equity_portion'],
+            f"{summary['tracking_error']:.4f}" if summary['tracking_error'] is not None else '-',
+            f"{summary['fitted_equity_portion']:.3f}" if summary['fitted_equity_portion'] is not None else '-',
+        ))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill estimated vs. official NAVs from historical prices")
+    parser.add_argument('urls', nargs='*', help="Groww fund URLs (defaults to the built-in list)")
+    parser.add_argument('--config', help="JSON file with funds, as for main.py")
+    parser.add_argument('--start', required=True, type=parse_date, help="first date to backfill")
+    parser.add_argument('--end', required=True, type=parse_date, help="last date to backfill")
+    parser.add_argument('--prices', required=True, help="CSV of daily closing prices")
+    parser.add_argument('--official-navs', help="CSV of official NAVs (fund_name, date, nav)")
+    parser.add_argument('--store', choices=STORE_BACKENDS, default='sqlite', help="where backfilled records are written")
+    parser.add_argument('--overwrite', action='store_true', help="replace calculated NAVs already stored")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from main import DEFAULT_URLS
+
+    args = parse_args()
+    store = open_store(args.store)
+    funds = load_fund_config(args.config)[0] if args.config else args.urls or DEFAULT_URLS
+    funds = [fund if isinstance(fund, dict) else {'url': fund} for fund in funds]
+
+    analyzers = []
+    for fund in funds:
+        analyzer = MutualFundAnalyzer(fund['url'], equity_portion=fund.get('equity_portion'), sheet_manager=store)
+        if analyzer.fetch_mf_data():
+            analyzers.append(analyzer)
+        else:
+            print(f"Failed to fetch mutual fund data for {analyzer.fund_name} - skipping")
+
+    prices = PriceHistory.load(args.prices)
+    official_navs = load_official_navs(args.official_navs) if args.official_navs else {}
+    print_backfill_summary(Backfill(analyzers, prices, store, official_navs, args.overwrite).run(args.start, args.end))
+    if hasattr(store, 'close'):
+        store.close()
@@ -0,0 +1,82 @@
+import threading
+import time
+import gspread
+
+
+class FakeWorksheet:
+    """In-memory stand-in for a gspread Worksheet"""
+    def __init__(self, client, title):
+        self.client = client
+        self.title = title
+        self.rows = []
+
+    def get_all_records(self):
+        self.client.call('get_all_records')
+        header = self.rows[0] if self.rows else []
+        return [dict(zip(header, row)) for row in self.rows[1:]]
+
+    def append_row(self, row):
+        self.client.call('append_row')
+        self.rows.append(list(row))
+
+    def append_rows(self, rows):
+        self.client.call('append_rows')
+        self.rows.extend(list(row) for row in rows)
+
+    def update(self, range_name, values):
+        self.client.call('update')
+        self.rows[int(range_name.split(':')[0][1:]) - 1] = list(values[0])
+
+    def update_cell(self, row, col, value):
+        self.client.call('update_cell')
+        self.rows[row - 1][col - 1] = value
+
+
+class FakeSpreadsheet:
+    def __init__(self, client):
+        self.client = client
+        self.worksheets = {}
+
+    def worksheet(self, title):
+        self.client.call('worksheet')
+        if title not in self.worksheets:
+            raise gspread.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        self.client.call('add_worksheet')
+        self.worksheets[title] = FakeWorksheet(self.client, title)
+        return self.worksheets[title]
+
+    def values_batch_update(self, body):
+        self.client.call('values_batch_update')
+        for data in body['data']:
+            title, cells = data['range'].split('!')
+            row = int(cells.split(':')[0][1:])
+            self.worksheets[title.strip("'")].rows[row - 1] = list(data['values'][0])
+
+
+class FakeSheetsClient:
+    """gspread client replacement that counts calls and simulates API latency"""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self._lock = threading.Lock()
+        self.spreadsheet = FakeSpreadsheet(self)
+
+    def call(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def open(self, name):
+        self.call('open')
+        return self.spreadsheet
+
+    def create(self, name):
+        self.call('create')
+        return self.spreadsheet
+
+    def total_calls(self):
+        return sum(self.calls.values())
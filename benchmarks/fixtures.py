@@ -0,0 +1,77 @@
+import json
+import random
+
+# Sizes observed on live pages; padding brings synthetic pages to the same
+# order of magnitude so parse timings are representative
+FUND_PAGE_PADDING_BYTES = 250_000
+QUOTE_PAGE_PADDING_BYTES = 400_000
+
+
+def company_name(index):
+    return f"Synthetic Holdings {index} Ltd."
+
+
+def ticker(index):
+    return f"SYN{index}"
+
+
+def _padding(size, seed):
+    rng = random.Random(seed)
+    chunk = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(1024))
+    return chunk * (size // len(chunk))
+
+
+def fund_page(slug, holdings_count, nav=1234.5678, seed=0):
+    """Groww-style fund page whose __NEXT_DATA__ carries NAV and holdings"""
+    rng = random.Random(seed)
+    weights = [rng.random() for _ in range(holdings_count)]
+    scale = 95 / sum(weights)
+    holdings = [
+        {
+            'company_name': company_name(i),
+            'corpus_per': round(w * scale, 4),
+            'nature_name': 'EQ',
+            'sector_name': 'Synthetic',
+        }
+        for i, w in enumerate(weights)
+    ]
+    next_data = {
+        'props': {
+            'pageProps': {
+                'mfServerSideData': {
+                    'scheme_name': slug,
+                    'holdings': holdings,
+                    'nav': nav,
+                    'nav_date': '15-Oct-2026',
+                },
+                'unrelatedSections': _padding(FUND_PAGE_PADDING_BYTES, seed),
+            }
+        }
+    }
+    return (
+        '<!DOCTYPE html><html><head><title>Fund</title></head><body>'
+        '<div id="__next"></div>'
+        f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script>'
+        '</body></html>'
+    )
+
+
+def quote_page(symbol, exchange, current, previous):
+    """Google Finance-style quote page with current price and previous close"""
+    return (
+        '<!DOCTYPE html><html><head><title>Quote</title></head><body>'
+        f'<script>{_padding(QUOTE_PAGE_PADDING_BYTES, symbol)}</script>'
+        f'<div data-last-price="{current}" data-currency-code="INR" '
+        f'data-last-normal-market-timestamp="1760522400">'
+        f'<div class="YMlKec fxKbKc">₹{current:,.2f}</div></div>'
+        '<div class="gyFHrc"><div class="mfs7Fc">Previous close</div>'
+        f'<div class="P6K39c">₹{previous:,.2f}</div></div>'
+        '</body></html>'
+    )
+
+
+def quote_prices(symbol):
+    """Deterministic (current, previous) prices for a synthetic ticker"""
+    rng = random.Random(symbol)
+    previous = rng.uniform(50, 5000)
+    return round(previous * rng.uniform(0.97, 1.03), 2), round(previous, 2)
@@ -0,0 +1,242 @@
+"""Offline benchmarks for the NAV pipeline
+
+Serves synthetic Groww fund pages and Google Finance quote pages from a
+local stub server and replaces Google Sheets with an in-memory fake, then
+times each stage for funds of several sizes. No network access is needed.
+
+    python benchmarks/run_benchmarks.py --holdings 10 50 200 500 --iterations 5
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import fixtures
+from fake_sheets import FakeSheetsClient
+from stub_server import StubServer
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class StageResult:
+    def __init__(self, stage, holdings):
+        self.stage = stage
+        self.holdings = holdings
+        self.latencies = []
+        self.requests = 0
+        self.sheets_calls = 0
+        self.peak_kb = 0
+
+    def as_dict(self):
+        runs = max(1, len(self.latencies))
+        return {
+            'stage': self.stage,
+            'holdings': self.holdings,
+            'p50_ms': percentile(self.latencies, 50) * 1000,
+            'p95_ms': percentile(self.latencies, 95) * 1000,
+            'p99_ms': percentile(self.latencies, 99) * 1000,
+            'requests_per_run': self.requests / runs,
+            'sheets_calls_per_run': self.sheets_calls / runs,
+            'peak_kb': self.peak_kb,
+        }
+
+
+class Benchmark:
+    def __init__(self, server, iterations, quote_latency):
+        self.server = server
+        self.iterations = iterations
+        self.quote_latency = quote_latency
+        self.results = []
+
+        # Imported after NAV_QUOTE_URL_TEMPLATE points at the stub server
+        from MutualFundAnalyzer import MutualFundAnalyzer, SheetManager
+        from http_client import HttpClient
+        from nav_engine import NavEngine
+        from quotes import QuoteCache
+        from page_cache import PageCache
+        from negative_cache import NegativeQuoteCache
+        from bhavcopy import EodQuoteSource
+        self.MutualFundAnalyzer = MutualFundAnalyzer
+        self.SheetManager = SheetManager
+        self.HttpClient = HttpClient
+        self.NavEngine = NavEngine
+        self.QuoteCache = QuoteCache
+        self.PageCache = PageCache
+        self.NegativeQuoteCache = NegativeQuoteCache
+        self.EodQuoteSource = EodQuoteSource
+        # Fresh page cache per analyzer unless a stage measures the warm path
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def sheet_manager(self, latency=0.0):
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager = self.SheetManager()
+        manager.client = FakeSheetsClient(latency)
+        manager.connected = True
+        return manager
+
+    def analyzer(self, holdings_count, execution_mode="threaded", page_cache=None):
+        analyzer = self.MutualFundAnalyzer(
+            self.server.fund_url('bench-fund', holdings_count),
+            equity_portion=0.95,
+            quote_cache=self.QuoteCache(),
+            execution_mode=execution_mode,
+            http=self.HttpClient(rate_limits={}),
+            sheet_manager=self.sheet_manager(),
+            nav_engine=self.NavEngine(),
+            page_cache=page_cache or self.PageCache(tempfile.mkdtemp(dir=self.cache_dir.name)),
+            # Keep local bhavcopies and failures from earlier runs out of the measurements
+            eod_source=self.EodQuoteSource(self.cache_dir.name),
+            negative_cache=self.NegativeQuoteCache(None),
+        )
+        analyzer.companies_ticker_and_Exchange = {
+            analyzer._clean_company_name(fixtures.company_name(i)): [fixtures.ticker(i), '0']
+            for i in range(holdings_count)
+        }
+        return analyzer
+
+    def measure(self, stage, holdings, setup, run, sheets=None):
+        """Time run(setup()) over the configured iterations"""
+        result = StageResult(stage, holdings)
+        for _ in range(self.iterations):
+            subject = setup()
+            self.server.latency = 0.0
+            requests_before = self.server.requests
+            sheets_before = sheets(subject).total_calls() if sheets else 0
+            self.server.latency = self.quote_latency
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                run(subject)
+            result.latencies.append(time.perf_counter() - started)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            result.peak_kb = max(result.peak_kb, peak // 1024)
+            result.requests += self.server.requests - requests_before
+            if sheets:
+                result.sheets_calls += sheets(subject).total_calls() - sheets_before
+        self.server.latency = 0.0
+        self.results.append(result)
+        return result
+
+    def bench_parsing(self, holdings):
+        from fund_page import parse_fund_page
+        from quotes import parse_quote_page
+
+        fund_html = fixtures.fund_page('bench-fund', holdings)
+        quote_html = fixtures.quote_page('SYN0', 'NSE', *fixtures.quote_prices('SYN0'))
+        self.measure('parse_fund_page', holdings, lambda: fund_html, parse_fund_page)
+        self.measure('parse_quote_page', holdings, lambda: quote_html,
+                     lambda html: parse_quote_page(html, 'SYN0', 'NSE'))
+
+    def bench_fetch(self, holdings):
+        self.measure('_fetch_mf_data_without_equity', holdings,
+                     lambda: self.analyzer(holdings),
+                     lambda a: a._fetch_mf_data_without_equity())
+        warm_cache = self.PageCache(tempfile.mkdtemp(dir=self.cache_dir.name))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.analyzer(holdings, page_cache=warm_cache)._fetch_mf_data_without_equity()
+        self.measure('_fetch_mf_data_without_equity[warm]', holdings,
+                     lambda: self.analyzer(holdings, page_cache=warm_cache),
+                     lambda a: a._fetch_mf_data_without_equity())
+        self.measure('fetch_mf_data', holdings,
+                     lambda: self.analyzer(holdings),
+                     lambda a: a.fetch_mf_data())
+
+    def bench_calculation(self, holdings):
+        for mode in ("threaded", "async"):
+            def setup(mode=mode):
+                analyzer = self.analyzer(holdings, mode)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    analyzer.fetch_mf_data()
+                return analyzer
+            self.measure(f'calculate_current_status[{mode}]', holdings, setup,
+                         lambda a: a.calculate_current_status())
+
+    def bench_sheets(self, holdings, sheets_latency):
+        def setup():
+            manager = self.sheet_manager(sheets_latency)
+            worksheet = manager.client.spreadsheet.add_worksheet('Bench', 1000, 20)
+            worksheet.rows = [list(manager.FIELD_NAMES)] + [
+                [f"{day:02d}/09/2026", '15:31:00', 100.0 + day, '', '', '', 'Bench', 0.95]
+                for day in range(1, 31)
+            ]
+            return manager
+
+        def run(manager):
+            manager.get_previous_calculation('Bench')
+            manager.update_official_nav('Bench', 130.5, '30/09/2026')
+            existing = manager.get_todays_record('Bench', '01/10/2026')
+            record = {'date': '01/10/2026', 'calculation_time': '10:00:00', 'calculated_nav': 131.0,
+                      'official_nav': '', 'difference': '', 'percentage_diff': '',
+                      'fund_name': 'Bench', 'equity_portion': 0.95}
+            if existing:
+                manager.update_record('Bench', existing['row_num'], record)
+            else:
+                manager.add_record('Bench', record)
+            manager.flush()
+            manager.show_comparison('Bench')
+
+        self.measure('sheet_manager_run', holdings, setup, run, sheets=lambda m: m.client)
+
+
+def print_results(results):
+    print("{:<36} {:>8} {:>10} {:>10} {:>10} {:>10} {:>8} {:>10}".format(
+        'Stage', 'Holdings', 'p50 ms', 'p95 ms', 'p99 ms', 'Requests', 'Sheets', 'Peak KB'))
+    print("-" * 110)
+    for result in results:
+        row = result.as_dict()
+        print("{:<36} {:>8} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.1f} {:>8.1f} {:>10}".format(
+            row['stage'], row['holdings'], row['p50_ms'], row['p95_ms'], row['p99_ms'],
+            row['requests_per_run'], row['sheets_calls_per_run'], row['peak_kb']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline NAV pipeline benchmarks")
+    parser.add_argument('--holdings', type=int, nargs='+', default=[10, 50, 200, 500])
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--quote-latency', type=float, default=0.0,
+                        help="seconds of simulated server latency per request")
+    parser.add_argument('--sheets-latency', type=float, default=0.0,
+                        help="seconds of simulated latency per Sheets API call")
+    parser.add_argument('--json', help="also write results to this file")
+    args = parser.parse_args()
+
+    server = StubServer().start()
+    os.environ['NAV_QUOTE_URL_TEMPLATE'] = server.quote_url_template
+    os.environ.setdefault('NAV_TRACE_LOG', '')
+    benchmark = Benchmark(server, args.iterations, args.quote_latency)
+
+    try:
+        for holdings in args.holdings:
+            benchmark.bench_parsing(holdings)
+            benchmark.bench_fetch(holdings)
+            benchmark.bench_calculation(holdings)
+        benchmark.bench_sheets(0, args.sheets_latency)
+    finally:
+        server.stop()
+
+    print_results(benchmark.results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([result.as_dict() for result in benchmark.results], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import hashlib
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import fixtures
+
+FUND_PATH = re.compile(r'^/mutual-funds/(?P<slug>[\w-]+?)-(?P<holdings>\d+)-direct-growth$')
+QUOTE_PATH = re.compile(r'^/finance/quote/(?P<ticker>[^:]+):(?P<exchange>\w+)')
+
+
+class StubServer:
+    """Serves synthetic fund and quote pages on localhost
+
+    Fund URLs encode their holdings count (/mutual-funds/<slug>-<n>-direct-growth)
+    and quote URLs mirror Google Finance. Pages are rendered once and cached;
+    an optional fixed latency simulates the remote hosts. Responses carry an
+    ETag and honour If-None-Match.
+    """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self._pages = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                body = server.render(self.path)
+                if server.latency:
+                    time.sleep(server.latency)
+                etag = f'"{hashlib.sha1(body).hexdigest()}"' if body is not None else None
+                if etag is not None and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                self.send_response(200 if body is not None else 404)
+                body = body or b''
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                if etag is not None:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def render(self, path):
+        with self._lock:
+            self.requests += 1
+            if path in self._pages:
+                return self._pages[path]
+
+        fund = FUND_PATH.match(path)
+        quote = QUOTE_PATH.match(path)
+        if fund:
+            html = fixtures.fund_page(fund.group('slug'), int(fund.group('holdings')))
+        elif quote:
+            current, previous = fixtures.quote_prices(quote.group('ticker'))
+            html = fixtures.quote_page(quote.group('ticker'), quote.group('exchange'), current, previous)
+        else:
+            return None
+
+        body = html.encode('utf-8')
+        with self._lock:
+            self._pages[path] = body
+        return body
+
+    def fund_url(self, slug, holdings_count):
+        return f"{self.base_url}/mutual-funds/{slug}-{holdings_count}-direct-growth"
+
+    @property
+    def quote_url_template(self):
+        return self.base_url + '/finance/quote/{ticker}:{exchange}'
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
@@ -0,0 +1,354 @@
+"""End-of-day quotes from exchange bhavcopy files
+
+NSE and BSE publish every security's close and previous close in one daily
+CSV (the bhavcopy). Files dropped into the bhavcopy directory are parsed
+into symbol-indexed NumPy price tables, so settled sessions can be priced
+without a request per holding and live runs only need the network for the
+current price. A day's files can be downloaded into the directory with:
+
+    python bhavcopy.py --date 2026-10-16
+
+Both the UDiFF format (TradDt, TckrSymb, ClsPric, PrvsClsgPric) and the
+older NSE layout (SYMBOL, SERIES, CLOSE, PREVCLOSE, TIMESTAMP) are read,
+plain or zipped.
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import zipfile
+from datetime import date, datetime, time, timedelta
+import numpy as np
+from quotes import Quote
+from snapshot_store import DEFAULT_CACHE_DIR
+
+DEFAULT_BHAVCOPY_DIR = os.environ.get('NAV_BHAVCOPY_DIR', 'bhavcopy')
+
+# UDiFF bhavcopy downloads, formatted with the trade date as YYYYMMDD
+BHAVCOPY_URLS = {
+    'NSE': 'https://nsearchives.nseindia.com/content/cm/BhavCopy_NSE_CM_0_0_0_{date}_F_0000.csv.zip',
+    'BOM': 'https://www.bseindia.com/download/BhavCopy/Equity/BhavCopy_BSE_CM_0_0_0_{date}_F_0000.CSV',
+}
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%b-%Y", "%d-%m-%Y", "%Y%m%d")
+
+DATE_COLUMNS = ('DATE', 'TIMESTAMP', 'TRADDT', 'TRADE_DATE')
+TICKER_COLUMNS = ('TICKER', 'SYMBOL', 'TCKRSYMB', 'SC_CODE', 'SECURITY CODE')
+BSE_CODE_COLUMNS = ('SC_CODE', 'FININSTRMID', 'SECURITY CODE')
+CLOSE_COLUMNS = ('CLOSE', 'CLSPRIC', 'CLOSE_PRICE', 'PRICE')
+PREVIOUS_CLOSE_COLUMNS = ('PREVCLOSE', 'PRVSCLSGPRIC', 'PREV_CLOSE', 'PREVIOUS_CLOSE')
+SERIES_COLUMNS = ('SERIES', 'SCTYSRS')
+SOURCE_COLUMNS = ('SRC',)
+EQUITY_SERIES = {'EQ', 'BE', 'BZ', ''}
+
+# Bhavcopy prices are closing prices, stamped with the session close
+SESSION_CLOSE = time(15, 30)
+
+
+def parse_date(value):
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value}")
+
+
+def find_column(fieldnames, candidates):
+    """Actual header for the first candidate present, ignoring case and padding"""
+    normalized = {name.strip().upper(): name for name in fieldnames}
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized[candidate]
+    return None
+
+
+def field(row, column):
+    """Stripped value of a CSV field, '' when the column is absent or the row is short"""
+    return (row.get(column) or '').strip() if column else ''
+
+
+def _open_csv(path):
+    """Text stream for a .csv file or the first CSV inside a .zip"""
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            names = [name for name in archive.namelist() if name.lower().endswith('.csv')]
+            if not names:
+                raise ValueError(f"{path} has no CSV inside")
+            return io.StringIO(archive.read(names[0]).decode('utf-8-sig'))
+    return open(path, newline='', encoding='utf-8-sig')
+
+
+def save_npz(path, **arrays):
+    """Write a compressed .npz through a temp file, so readers never see half a file"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class EodTable:
+    """One exchange's closing prices for one trading day
+
+    Symbols map to rows of two float arrays (close and previous close), so a
+    lookup is a dict hit and the whole table costs a few bytes per security.
+    """
+    def __init__(self, exchange, trade_date, symbols, closes, previous_closes):
+        self.exchange = exchange  # 'NSE' or 'BOM', as used in quote candidates
+        self.trade_date = trade_date
+        self.rows = {symbol: row for row, symbol in enumerate(symbols)}
+        self.closes = closes
+        self.previous_closes = previous_closes
+
+    def __len__(self):
+        return len(self.rows)
+
+    def prices(self, ticker):
+        """(close, previous close) for a symbol, or None; previous close may be NaN"""
+        row = self.rows.get(str(ticker))
+        if row is None:
+            return None
+        return float(self.closes[row]), float(self.previous_closes[row])
+
+    @classmethod
+    def read(cls, path):
+        symbols, closes, previous_closes = [], [], []
+        exchange = trade_date = None
+        with _open_csv(path) as f:
+            reader = csv.DictReader(f)
+            fieldnames = reader.fieldnames or []
+            date_col = find_column(fieldnames, DATE_COLUMNS)
+            close_col = find_column(fieldnames, CLOSE_COLUMNS)
+            previous_col = find_column(fieldnames, PREVIOUS_CLOSE_COLUMNS)
+            series_col = find_column(fieldnames, SERIES_COLUMNS)
+            source_col = find_column(fieldnames, SOURCE_COLUMNS)
+            nse_col = find_column(fieldnames, TICKER_COLUMNS)
+            bse_col = find_column(fieldnames, BSE_CODE_COLUMNS)
+            if not (date_col and close_col and (nse_col or bse_col)):
+                raise ValueError(f"{path} is not a bhavcopy (needs date, symbol and close columns)")
+
+            for row in reader:
+                if exchange is None:
+                    source = field(row, source_col).upper()
+                    is_bse = source == 'BSE' or (not source and nse_col == bse_col)
+                    exchange = 'BOM' if is_bse else 'NSE'
+                    ticker_col = bse_col if is_bse else nse_col
+                    if ticker_col is None:
+                        raise ValueError(f"{path} has no symbol column for {exchange}")
+                # BSE series are groups (A, B, T, ...) rather than NSE's EQ/BE
+                if exchange == 'NSE' and series_col and field(row, series_col).upper() not in EQUITY_SERIES:
+                    continue
+                symbol = field(row, ticker_col)
+                try:
+                    close = float(field(row, close_col))
+                    previous = float(field(row, previous_col)) if field(row, previous_col) else np.nan
+                    day = parse_date(field(row, date_col))
+                except (ValueError, TypeError):
+                    continue
+                if not symbol:
+                    continue
+                trade_date = trade_date or day
+                symbols.append(symbol)
+                closes.append(close)
+                previous_closes.append(previous)
+
+        if exchange is None:
+            raise ValueError(f"{path} has no equity rows")
+        return cls(exchange, trade_date, symbols, np.array(closes), np.array(previous_closes))
+
+    @classmethod
+    def load(cls, path, cache_dir=DEFAULT_CACHE_DIR):
+        """Parse a bhavcopy, using the .npz copy cached for this file when present"""
+        stat = os.stat(path)
+        key = hashlib.sha256(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+        cache_path = os.path.join(cache_dir, 'bhavcopy', f"{key.hexdigest()[:16]}.npz")
+
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as data:
+                    return cls(
+                        str(data['exchange']),
+                        datetime.strptime(str(data['trade_date']), "%Y-%m-%d").date(),
+                        [str(symbol) for symbol in data['symbols']],
+                        data['closes'],
+                        data['previous_closes'],
+                    )
+            except Exception as e:
+                print(f"Warning: Re-parsing bhavcopy {path}, cached copy is unreadable ({str(e)})")
+
+        table = cls.read(path)
+        try:
+            save_npz(
+                cache_path,
+                exchange=np.array(table.exchange),
+                trade_date=np.array(table.trade_date.isoformat()),
+                symbols=np.array(list(table.rows)),
+                closes=table.closes,
+                previous_closes=table.previous_closes,
+            )
+        except OSError as e:
+            print(f"Warning: Could not cache bhavcopy ({str(e)})")
+        return table
+
+
+class EodQuoteSource:
+    """Quote source backed by the bhavcopies in a directory
+
+    session_quote() prices a listing entirely from the file for a settled
+    session. previous_close() supplies the last close before a date, which
+    is the previous close of a live quote taken that day.
+    """
+    def __init__(self, directory=DEFAULT_BHAVCOPY_DIR, cache_dir=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self._tables = None  # exchange -> {trade_date: EodTable}
+        self._lock = threading.Lock()
+
+    def files(self):
+        return sorted(
+            path for pattern in ('*.csv', '*.CSV', '*.zip')
+            for path in glob.glob(os.path.join(self.directory, pattern))
+        )
+
+    def _load(self):
+        with self._lock:
+            if self._tables is None:
+                tables = {}
+                for path in self.files():
+                    try:
+                        table = EodTable.load(path, self.cache_dir)
+                    except Exception as e:
+                        # One bad file must not stop the others from pricing
+                        print(f"Warning: Skipping bhavcopy {path} ({str(e)})")
+                        continue
+                    tables.setdefault(table.exchange, {})[table.trade_date] = table
+                self._tables = tables
+            return self._tables
+
+    def reload(self):
+        with self._lock:
+            self._tables = None
+
+    def sessions(self, exchange):
+        """Trading dates with a loaded bhavcopy for an exchange, oldest first"""
+        return sorted(self._load().get(exchange, {}))
+
+    def session_quote(self, ticker, exchange, session):
+        """Complete Quote from the bhavcopy of `session`, or None if not covered"""
+        table = self._load().get(exchange, {}).get(session)
+        prices = table.prices(ticker) if table is not None else None
+        if prices is None or np.isnan(prices[1]):
+            return None
+        return Quote(ticker, exchange, prices[0], prices[1], 'INR', datetime.combine(session, SESSION_CLOSE))
+
+    def previous_close(self, ticker, exchange, before):
+        """Close from the bhavcopy of the trading session before `before`, or None
+
+        Only that session's file is used: an older one (a missing download or
+        an exchange holiday) would not be the close the live price moved
+        from, so the live quote's own previous close is kept instead.
+        """
+        table = self._load().get(exchange, {}).get(previous_session(before))
+        prices = table.prices(ticker) if table is not None else None
+        return prices[0] if prices is not None else None
+
+    def last_close_quote(self, ticker, exchange, before):
+        """Quote priced flat at the newest close dated before `before`, or None
+
+        Used in place of a live quote while the quote host is unavailable:
+        current price and previous close are both the last close, so the
+        holding stays in the NAV without contributing a move.
+        """
+        tables = self._load().get(exchange, {})
+        for day in sorted((day for day in tables if day < before), reverse=True):
+            prices = tables[day].prices(ticker)
+            if prices is not None:
+                return Quote(ticker, exchange, prices[0], prices[0], 'INR', datetime.combine(day, SESSION_CLOSE))
+        return None
+
+    def download(self, trade_date, http=None):
+        """Fetch the NSE and BSE bhavcopies for a date into the directory, once
+
+        Returns the paths that are now present; failures are reported and
+        skipped so one exchange being unavailable does not stop the other.
+        """
+        from http_client import get_http_client
+        http = http if http is not None else get_http_client()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = trade_date.strftime("%Y%m%d")
+        paths = []
+        for exchange, template in BHAVCOPY_URLS.items():
+            url = template.format(date=stamp)
+            path = os.path.join(self.directory, os.path.basename(url))
+            if not os.path.exists(path):
+                try:
+                    response = http.get(url, timeout=30, headers={'User-Agent': 'Mozilla/5.0'})
+                    response.raise_for_status()
+                    with open(f"{path}.tmp", 'wb') as f:
+                        f.write(response.content)
+                    os.replace(f"{path}.tmp", path)
+                except Exception as e:
+                    print(f"Warning: Could not download {exchange} bhavcopy for {trade_date} ({str(e)})")
+                    continue
+            paths.append(path)
+        self.reload()
+        return paths
+
+
+def previous_session(day):
+    """Weekday before `day`; exchange holidays are not known here"""
+    day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def settled_session(now, market_open, market_close):
+    """Trading date whose closing prices decide a run at `now`, or None while the market is open
+
+    Weekends are skipped; exchange holidays are not known here, so on those
+    days no bhavcopy matches and live quotes are used instead.
+    """
+    if now.weekday() < 5 and now.time() >= market_open:
+        return now.date() if now.time() >= market_close else None
+    return previous_session(now.date())
+
+
+_default_source = None
+_default_source_lock = threading.Lock()
+
+
+def get_eod_source():
+    """Process-wide source for DEFAULT_BHAVCOPY_DIR, loaded on first use"""
+    global _default_source
+    with _default_source_lock:
+        if _default_source is None:
+            _default_source = EodQuoteSource()
+        return _default_source
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download NSE and BSE bhavcopies for end-of-day quotes")
+    parser.add_argument('--date', type=parse_date, default=date.today(), help="trade date (default today)")
+    parser.add_argument('--dir', default=DEFAULT_BHAVCOPY_DIR, help="bhavcopy directory")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    source = EodQuoteSource(args.dir)
+    source.download(args.date)
+    for exchange in BHAVCOPY_URLS:
+        sessions = source.sessions(exchange)
+        print(f"{exchange}: {len(sessions)} sessions, latest {sessions[-1] if sessions else '-'}")
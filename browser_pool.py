@@ -0,0 +1,155 @@
+import atexit
+import queue
+import re
+import threading
+from contextlib import contextmanager
+
+# Selenium and webdriver_manager are imported where a browser is actually
+# needed; runs with a known or snapshotted equity portion never load them.
+
+EQUITY_PATTERN = re.compile(r"Equity\s*\n\s*([+-]?[0-9]*\.?[0-9]+%)")
+
+
+class BrowserPool:
+    """Bounded pool of long-lived headless Chrome drivers shared across analyzers
+
+    Drivers are started lazily, up to `size`, and each job gets a fresh tab
+    that is closed afterwards so one Chrome start is amortised over every
+    fund in the run.
+    """
+    def __init__(self, size=2):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._drivers = []
+        self._lock = threading.Lock()
+        self._driver_path = None
+
+    def _driver_service(self):
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        # ChromeDriverManager resolves/downloads the driver; do it once per process
+        if self._driver_path is None:
+            self._driver_path = ChromeDriverManager().install()
+        return ChromeService(self._driver_path)
+
+    def _create_driver(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--window-size=1920,1080")
+        return webdriver.Chrome(service=self._driver_service(), options=chrome_options)
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                if len(self._drivers) < self.size:
+                    driver = self._create_driver()
+                    self._drivers.append(driver)
+                    return driver
+
+            # Re-check capacity periodically in case a broken driver was discarded
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def _discard(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def tab(self):
+        """Borrow a driver focused on a new tab; the tab is closed on exit"""
+        from selenium.common.exceptions import WebDriverException
+
+        driver = self._acquire()
+        try:
+            home = driver.current_window_handle
+            driver.switch_to.new_window('tab')
+        except WebDriverException:
+            self._discard(driver)
+            raise
+
+        healthy = True
+        try:
+            yield driver
+        except WebDriverException:
+            healthy = False
+            raise
+        finally:
+            try:
+                driver.close()
+                driver.switch_to.window(home)
+            except WebDriverException:
+                healthy = False
+            if healthy:
+                self._idle.put(driver)
+            else:
+                self._discard(driver)
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+def fetch_equity_portion(pool, url, timeout=20):
+    """Load a fund page and read its equity allocation as a fraction
+
+    Scrolls until the "Equity" allocation text is rendered instead of
+    sleeping for fixed intervals. Returns None if it never renders, so the
+    caller can tell a scraped value from a default.
+    """
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    with pool.tab() as driver:
+        driver.get(url)
+
+        def equity_rendered(d):
+            match = EQUITY_PATTERN.search(d.find_element(By.TAG_NAME, "body").text)
+            if match:
+                return match
+            # Allocation is lazy-loaded further down the page
+            d.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            return False
+
+        try:
+            match = WebDriverWait(driver, timeout, poll_frequency=0.25).until(equity_rendered)
+        except TimeoutException:
+            return None
+
+        return float(match.group(1).replace('%', '')) / 100
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Process-wide browser pool, closed at interpreter exit"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = BrowserPool()
+            atexit.register(_default_pool.close)
+        return _default_pool
@@ -0,0 +1,163 @@
+import json
+from datetime import date, datetime
+
+NEXT_DATA_MARKER = 'id="__NEXT_DATA__"'
+
+
+def fund_name_from_url(url):
+    """Fund name used for sheets and records, derived from a Groww fund URL"""
+    # Extract the fund name part from the URL
+    fund_part = url.split('/')[-1].replace('-direct-growth', '').replace('-', ' ').title()
+    # Remove any "Direct" or "Growth" suffixes
+    fund_part = fund_part.replace('Direct', '').replace('Growth', '').strip()
+    return fund_part
+
+
+class Holding:
+    """One line of a fund's disclosed portfolio"""
+    def __init__(self, company_name, corpus_per, nature=None, sector=None):
+        self.company_name = company_name
+        self.corpus_per = corpus_per
+        self.nature = nature
+        self.sector = sector
+
+    def __repr__(self):
+        return f"Holding({self.company_name!r}, {self.corpus_per})"
+
+    def to_dict(self):
+        return {
+            'company_name': self.company_name,
+            'corpus_per': self.corpus_per,
+            'nature': self.nature,
+            'sector': self.sector,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['company_name'], data['corpus_per'], data.get('nature'), data.get('sector'))
+
+
+class FundPage:
+    """Data extracted from a Groww mutual fund page"""
+    def __init__(self, nav, nav_date, holdings, allocation):
+        self.nav = nav
+        self.nav_date = nav_date
+        self.holdings = holdings
+        self.allocation = allocation  # asset nature -> percent of corpus
+
+    def to_dict(self):
+        return {
+            'nav': self.nav,
+            'nav_date': self.nav_date.isoformat() if self.nav_date else None,
+            'holdings': [holding.to_dict() for holding in self.holdings],
+            'allocation': self.allocation,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['nav'],
+            date.fromisoformat(data['nav_date']) if data.get('nav_date') else None,
+            [Holding.from_dict(holding) for holding in data['holdings']],
+            data.get('allocation', {}),
+        )
+
+
+def next_data_text(html):
+    """Return the raw __NEXT_DATA__ script body without building a DOM"""
+    marker = html.find(NEXT_DATA_MARKER)
+    if marker == -1:
+        raise ValueError("Holdings data script not found")
+    start = html.find('>', marker) + 1
+    end = html.find('</script>', start)
+    if start == 0 or end == -1:
+        raise ValueError("Holdings data script is truncated")
+    return html[start:end]
+
+
+def extract_next_data(html):
+    """Return the decoded __NEXT_DATA__ JSON"""
+    return json.loads(next_data_text(html))
+
+
+def _children(node):
+    if isinstance(node, dict):
+        return node.values()
+    if isinstance(node, list):
+        return node
+    return ()
+
+
+def _find_fund_data(node):
+    """Depth-first search for the object that carries both NAV and holdings"""
+    if isinstance(node, dict) and 'nav' in node and isinstance(node.get('holdings'), list):
+        return node
+    for child in _children(node):
+        found = _find_fund_data(child)
+        if found is not None:
+            return found
+    return None
+
+
+def _find_key(node, key):
+    """Depth-first search for the first value stored under key"""
+    if isinstance(node, dict) and node.get(key) is not None:
+        return node[key]
+    for child in _children(node):
+        found = _find_key(child, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _parse_nav_date(value):
+    if not value:
+        return None
+    for fmt in ("%d-%b-%Y", "%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_fund_page(html):
+    """Parse a fund page into a FundPage"""
+    return parse_next_data(extract_next_data(html))
+
+
+def parse_next_data(next_data):
+    """Build a FundPage from a decoded __NEXT_DATA__ payload"""
+    fund_data = _find_fund_data(next_data)
+    if fund_data is None:
+        # Fall back to the first NAV and holdings anywhere in the payload
+        fund_data = {
+            'nav': _find_key(next_data, 'nav'),
+            'nav_date': _find_key(next_data, 'nav_date'),
+            'holdings': _find_key(next_data, 'holdings'),
+        }
+        if not isinstance(fund_data['holdings'], list):
+            raise ValueError("Could not parse holdings data")
+
+    nav = fund_data.get('nav')
+    if nav is None:
+        raise ValueError("NAV element not found")
+    if isinstance(nav, str):
+        nav = float(nav.replace(",", ""))
+
+    holdings = [
+        Holding(
+            d['company_name'],
+            d.get('corpus_per'),
+            d.get('nature_name'),
+            d.get('sector_name'),
+        )
+        for d in fund_data['holdings']
+    ]
+
+    allocation = {}
+    for holding in holdings:
+        if holding.nature and holding.corpus_per is not None:
+            allocation[holding.nature] = allocation.get(holding.nature, 0) + holding.corpus_per
+
+    return FundPage(float(nav), _parse_nav_date(fund_data.get('nav_date')), holdings, allocation)
@@ -0,0 +1,442 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from instrumentation import TRACER
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 10
+
+# Per-host token buckets as (requests per second, burst size). A host matches
+# an entry if it equals the key or is a subdomain of it.
+DEFAULT_RATE_LIMITS = {
+    'groww.in': (2, 4),
+    'google.com': (8, 16),
+}
+
+
+def scaled_rate_limits(share, limits=None):
+    """Rate limits for one of several processes sharing the default budget"""
+    limits = DEFAULT_RATE_LIMITS if limits is None else limits
+    return {host: (rate * share, max(1, burst * share)) for host, (rate, burst) in limits.items()}
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Responses that mean the host wants us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+# Adaptive per-host concurrency: every host starts at the initial limit and
+# may grow up to the maximum while it stays healthy
+DEFAULT_INITIAL_CONCURRENCY = 8
+DEFAULT_MAX_CONCURRENCY = 64
+
+# Consecutive failed requests that open a host's circuit, and how long it
+# stays open before a probe request is let through
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+MAX_RESET_TIMEOUT = 600.0
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of sending a request to a host whose circuit is open"""
+
+
+class BlockedResponseError(requests.RequestException):
+    """Raised when a host answers with a block page (e.g. a CAPTCHA) instead of content"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to throttle requests to one host"""
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class LoopWaiters:
+    """Event-loop coroutines waiting for a slot that any thread may free
+
+    The owner calls add() and wake_all() while holding its own lock; each
+    waiter's future is resolved on its loop, so coroutines sleep until a
+    release instead of polling.
+    """
+    def __init__(self):
+        self._waiters = []  # (loop, future)
+
+    def add(self, loop):
+        future = loop.create_future()
+        self._waiters.append((loop, future))
+        return future
+
+    def wake_all(self):
+        waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                pass  # the waiting loop has already closed
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RequestCap:
+    """Global cap on concurrent requests, shared by worker threads and event loops"""
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._loop_waiters = LoopWaiters()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def acquire_or_wait(self, loop):
+        """Take a slot and return None, or return a future on `loop` resolved at the next release"""
+        with self._cond:
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                return None
+            return self._loop_waiters.add(loop)
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+            self._loop_waiters.wake_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one host
+
+    Each healthy response grows the limit by 1/limit, roughly one slot per
+    round of requests. A timeout, connection error or throttling status
+    halves it, at most once per cooldown so a burst of failures from the
+    same round only counts once. Responses much slower than the recent best
+    latency hold the limit steady instead of growing it.
+    """
+    def __init__(self, initial=DEFAULT_INITIAL_CONCURRENCY, min_limit=1, max_limit=DEFAULT_MAX_CONCURRENCY,
+                 backoff=0.5, latency_tolerance=2.0, cooldown=1.0):
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._best_latency = None
+        self._last_decrease = float('-inf')
+        self._cond = threading.Condition()
+        self._loop_waiters = LoopWaiters()
+
+    def acquire_or_wait(self, loop):
+        """Take a slot and return None, or return a future on `loop` resolved at the next release"""
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return None
+            return self._loop_waiters.add(loop)
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency=None, congested=False):
+        """Free a slot and adapt the limit; latency is None when the response says nothing about load"""
+        with self._cond:
+            self.in_flight -= 1
+            if congested:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            elif latency is not None:
+                # Recent best latency, drifting up slowly so a lasting change in
+                # network conditions becomes the new baseline
+                if self._best_latency is None:
+                    self._best_latency = latency
+                else:
+                    self._best_latency = min(latency, self._best_latency * 1.02)
+                if latency <= self._best_latency * self.latency_tolerance:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+            self._loop_waiters.wake_all()
+            return int(self.limit)
+
+
+class CircuitBreaker:
+    """Stops requests to one host after repeated failures
+
+    Closed: requests flow and consecutive failures are counted. Open: after
+    `failure_threshold` failures every request is refused until the reset
+    timeout passes. Half-open: a single probe is let through; success
+    closes the circuit, failure reopens it with the timeout doubled.
+    """
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 max_reset_timeout=MAX_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a request may be sent now"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def is_open(self):
+        with self._lock:
+            return self.state != 'closed'
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            self._probing = False
+
+    def record_cancelled(self):
+        """Forget an abandoned request so another one can probe"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        """Count a failure; returns True if this failure opened the circuit"""
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open':
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            elif self.state == 'open' or self.failures < self.failure_threshold:
+                return False
+            self.state = 'open'
+            self._opened_at = time.monotonic()
+            self._probing = False
+            return True
+
+
+class HttpClient:
+    """Pooled keep-alive session with per-host rate limits and jittered retries
+
+    A single client is shared by all scrapers so TCP/TLS connections are
+    reused across ThreadPoolExecutor workers instead of being set up on every
+    call.
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, rate_limits=None, max_retries=2,
+                 backoff_base=0.5, backoff_cap=8.0, timeout=DEFAULT_TIMEOUT, max_in_flight=None,
+                 initial_concurrency=DEFAULT_INITIAL_CONCURRENCY, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.pool_size = 0
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        # Global cap on concurrent requests across every host and caller
+        self._in_flight = RequestCap(max_in_flight) if max_in_flight else None
+        self.ensure_pool_size(max(pool_size, max_in_flight or 0))
+
+        limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self._buckets = {
+            host: TokenBucket(rate, burst) for host, (rate, burst) in limits.items()
+        }
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = min(max_concurrency, max_in_flight) if max_in_flight else max_concurrency
+        self._limiters = {}
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+
+    def ensure_pool_size(self, pool_size):
+        """Grow the connection pool so every worker thread can hold a connection"""
+        with self._lock:
+            if pool_size <= self.pool_size:
+                return
+            adapter = HTTPAdapter(pool_connections=len(DEFAULT_RATE_LIMITS) + 2, pool_maxsize=pool_size)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self.pool_size = pool_size
+
+    def bucket_for(self, host):
+        for domain, bucket in self._buckets.items():
+            if host == domain or host.endswith('.' + domain):
+                return bucket
+        return None
+
+    def limiter_for(self, host):
+        """Adaptive concurrency limiter for a host, created on first use"""
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = AdaptiveLimiter(self.initial_concurrency, max_limit=self.max_concurrency)
+                self._limiters[host] = limiter
+            return limiter
+
+    def breaker_for(self, host):
+        """Circuit breaker for a host, created on first use"""
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._breakers[host] = breaker
+            return breaker
+
+    def circuit_open(self, host):
+        return self.breaker_for(host).is_open()
+
+    def report_failure(self, host, reason):
+        """Count a failed request against a host's circuit"""
+        if self.breaker_for(host).record_failure():
+            print(f"Warning: Too many failures from {host} ({reason}) - pausing requests to it")
+            TRACER.count(f'circuit_open.{host}')
+
+    def acquire_request_or_wait(self, loop):
+        """Take a slot of the global in-flight cap and return None, or a future resolved when one frees"""
+        return self._in_flight.acquire_or_wait(loop) if self._in_flight is not None else None
+
+    def release_request(self):
+        if self._in_flight is not None:
+            self._in_flight.release()
+
+    def concurrency_limits(self):
+        """Current adaptive limit per host"""
+        with self._lock:
+            return {host: int(limiter.limit) for host, limiter in self._limiters.items()}
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, honouring a numeric Retry-After"""
+        if retry_after and retry_after.isdigit():
+            return min(self.backoff_cap, float(retry_after))
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def _send(self, host, limiter, url, kwargs):
+        """One attempt while holding a slot of the host's adaptive limit"""
+        limiter.acquire()
+        started = time.perf_counter()
+        latency, congested = None, False
+        try:
+            if self._in_flight is not None:
+                with self._in_flight:
+                    response = self.session.get(url, **kwargs)
+            else:
+                response = self.session.get(url, **kwargs)
+            if response.status_code in THROTTLE_STATUSES:
+                congested = True
+            elif response.status_code < 500:
+                latency = time.perf_counter() - started
+            return response
+        except (requests.ConnectionError, requests.Timeout):
+            congested = True
+            raise
+        finally:
+            TRACER.gauge(f'concurrency_limit.{host}', limiter.release(latency, congested))
+
+    def get(self, url, is_blocked=None, **kwargs):
+        """GET with rate limiting and retries on connection errors and retryable statuses
+
+        Raises CircuitOpenError without sending anything while the host's
+        circuit is open. is_blocked(url, text), if given, recognises block
+        pages; they count against the host and raise BlockedResponseError.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlparse(url).hostname or ''
+        breaker = self.breaker_for(host)
+        if not breaker.allow():
+            TRACER.count('http.circuit_rejected')
+            raise CircuitOpenError(f"Circuit open for {host}")
+        try:
+            response = self._get(host, url, kwargs)
+        except requests.RequestException:
+            self.report_failure(host, 'connection errors')
+            raise
+        if response.status_code in RETRY_STATUSES:
+            self.report_failure(host, f"HTTP {response.status_code}")
+        elif is_blocked is not None and is_blocked(response.url, response.text):
+            self.report_failure(host, 'block page')
+            raise BlockedResponseError(f"{host} served a block page")
+        else:
+            breaker.record_success()
+        return response
+
+    def _get(self, host, url, kwargs):
+        bucket = self.bucket_for(host)
+        limiter = self.limiter_for(host)
+
+        with TRACER.span('http.request', host=host, path=urlparse(url).path) as span:
+            for attempt in range(self.max_retries + 1):
+                span['retries'] = attempt
+                if bucket is not None:
+                    bucket.acquire()
+                response = None
+                try:
+                    response = self._send(host, limiter, url, kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.max_retries:
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                        span['status'] = response.status_code
+                        span['bytes'] = len(response.content)
+                        span['limit'] = int(limiter.limit)
+                        return response
+                retry_after = response.headers.get('Retry-After') if response is not None else None
+                time.sleep(self.backoff_delay(attempt, retry_after))
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Process-wide client shared by every analyzer"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
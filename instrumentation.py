@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# The workflow archives *.log from the working directory. Set NAV_TRACE_LOG
+# to another path, or to an empty string to disable the trace file.
+DEFAULT_TRACE_LOG = os.environ.get('NAV_TRACE_LOG', 'nav_trace.log')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Tracer:
+    """Structured spans and counters, written as one JSON object per line
+
+    Every finished span is appended to the trace log with its name,
+    duration and attributes, and its duration is kept in memory so a
+    metrics summary can be printed at the end of the run.
+    """
+    def __init__(self, path=DEFAULT_TRACE_LOG):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+        self._durations = {}  # span name -> [duration_ms, ...]
+        self._errors = {}  # span name -> error count
+        self._counters = {}
+        self._gauges = {}  # name -> {'last', 'min', 'max'}
+
+    def _write(self, record):
+        if not self.path:
+            return
+        line = json.dumps(record, default=str)
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write(line + '\n')
+                self._file.flush()
+            except OSError as e:
+                print(f"Warning: Could not write trace log ({str(e)})")
+                self.path = None
+
+    def record(self, name, duration_ms, **attrs):
+        """Record a finished span"""
+        with self._lock:
+            self._durations.setdefault(name, []).append(duration_ms)
+            if 'error' in attrs:
+                self._errors[name] = self._errors.get(name, 0) + 1
+        self._write(dict(
+            {'ts': datetime.now().isoformat(timespec='milliseconds'), 'span': name,
+             'duration_ms': round(duration_ms, 3)},
+            **attrs
+        ))
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time a block; the yielded dict can be filled with more attributes"""
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs['error'] = f"{type(e).__name__}: {str(e)}"
+            raise
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000, **attrs)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """Track the latest, lowest and highest value of a changing quantity"""
+        with self._lock:
+            gauge = self._gauges.get(name)
+            if gauge is None:
+                self._gauges[name] = {'last': value, 'min': value, 'max': value}
+            else:
+                gauge['last'] = value
+                gauge['min'] = min(gauge['min'], value)
+                gauge['max'] = max(gauge['max'], value)
+
+    def summary(self):
+        """Per-span count/p50/p95/max, counters and gauges"""
+        with self._lock:
+            durations = {name: list(values) for name, values in self._durations.items()}
+            errors = dict(self._errors)
+            counters = dict(self._counters)
+            gauges = {name: dict(gauge) for name, gauge in self._gauges.items()}
+        spans = {
+            name: {
+                'count': len(values),
+                'errors': errors.get(name, 0),
+                'p50_ms': percentile(values, 50),
+                'p95_ms': percentile(values, 95),
+                'max_ms': max(values),
+                'total_ms': sum(values),
+            }
+            for name, values in durations.items()
+        }
+        return {'spans': spans, 'counters': counters, 'gauges': gauges}
+
+    def print_summary(self):
+        summary = self.summary()
+        self._write(dict({'ts': datetime.now().isoformat(timespec='milliseconds'), 'span': 'summary'}, **summary))
+
+        print("\nRun Metrics:")
+        print("{:<28} {:>7} {:>7} {:>10} {:>10} {:>10}".format('Span', 'Count', 'Errors', 'p50 ms', 'p95 ms', 'Max ms'))
+        print("-" * 76)
+        for name, stats in sorted(summary['spans'].items()):
+            print("{:<28} {:>7} {:>7} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+                name, stats['count'], stats['errors'], stats['p50_ms'], stats['p95_ms'], stats['max_ms']))
+        for name, value in sorted(summary['counters'].items()):
+            print(f"{name}: {value}")
+        for name, gauge in sorted(summary['gauges'].items()):
+            print(f"{name}: {gauge['last']} (min {gauge['min']}, max {gauge['max']})")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# Process-wide tracer used by every module
+TRACER = Tracer()
@@ -0,0 +1,122 @@
+import time
+from datetime import datetime, timedelta
+from MutualFundAnalyzer import MutualFundAnalyzer, MARKET_OPEN, MARKET_CLOSE
+from local_store import open_store
+from nav_engine import NavEngine
+from quotes import QuoteCache
+from instrumentation import TRACER
+
+DEFAULT_POLL_INTERVAL = 60
+
+
+class IntradayDaemon:
+    """Long-running intraday NAV estimator
+
+    Holdings and equity portions are loaded once at startup. Quotes are then
+    polled on a fixed interval during market hours and fed into a NAV engine
+    that only recomputes the contribution of holdings whose price changed.
+    A fund's record is only rewritten when its NAV moves by more than the
+    storage threshold. The daemon only polls on weekdays.
+    """
+    def __init__(self, urls, interval=DEFAULT_POLL_INTERVAL, store_backend='sheets', **analyzer_options):
+        self.interval = interval
+        self.sheet_manager = open_store(store_backend)
+        self.nav_engine = NavEngine()
+        # Expire quotes before the next poll so every cycle sees fresh prices
+        self.quote_cache = QuoteCache(ttl=max(1, interval / 2))
+        self.analyzers = [
+            MutualFundAnalyzer(
+                url,
+                sheet_manager=self.sheet_manager,
+                nav_engine=self.nav_engine,
+                quote_cache=self.quote_cache,
+                **analyzer_options
+            )
+            for url in urls
+        ]
+        self.last_navs = {}
+
+    def load(self):
+        """Fetch holdings for every fund once; funds that fail are dropped"""
+        loaded = []
+        for analyzer in self.analyzers:
+            print(f"\nLoading: {analyzer.fund_name}")
+            analyzer.update_previous_official_nav()
+            if analyzer.fetch_mf_data():
+                loaded.append(analyzer)
+            else:
+                print(f"Failed to fetch mutual fund data for {analyzer.fund_name} - skipping")
+        self.analyzers = loaded
+
+    def poll(self):
+        """Fetch quotes for all funds and store NAVs that moved"""
+        now = datetime.now()
+        today = now.date().strftime("%d/%m/%Y")
+        updated = []
+
+        # A quote fetched for one fund also moves every other fund holding
+        # that company, so collect all changes before evaluating any fund
+        changed = set()
+        for analyzer in self.analyzers:
+            changed |= analyzer.push_quotes(analyzer.fetch_quotes())
+            changed |= analyzer.pop_late_changes()
+
+        # Every fund's percent change and NAV in one vectorised pass
+        results = self.nav_engine.evaluate()
+        for analyzer in self.analyzers:
+            if analyzer.fund_name not in changed and analyzer.fund_name in self.last_navs:
+                continue
+
+            percent_change, nav = results[analyzer.fund_name]
+            rounded_nav = round(nav, 4)
+            self.last_navs[analyzer.fund_name] = rounded_nav
+            print(f"{now:%H:%M:%S} {analyzer.fund_name}: {rounded_nav:.4f} ({percent_change:+.3f}%)")
+            if analyzer.store_calculation(rounded_nav, now.time(), today):
+                updated.append(analyzer.fund_name)
+
+        if updated:
+            try:
+                self.sheet_manager.flush()
+            except Exception as e:
+                print(f"Failed to update sheet: {str(e)}")
+        return updated
+
+    def _seconds_until_open(self, now):
+        opens_at = datetime.combine(now.date(), MARKET_OPEN)
+        if now >= opens_at:
+            opens_at = datetime.combine(now.date() + timedelta(days=1), MARKET_OPEN)
+        return (opens_at - now).total_seconds()
+
+    def run(self):
+        """Poll until today's market close, waiting for the open if started early"""
+        if datetime.now().weekday() >= 5:
+            print("Market closed on weekends - exiting")
+            if hasattr(self.sheet_manager, 'close'):
+                self.sheet_manager.close()
+            return
+
+        self.load()
+        if not self.analyzers:
+            print("No funds loaded - exiting")
+            return
+
+        now = datetime.now()
+        if now.time() < MARKET_OPEN:
+            wait = self._seconds_until_open(now)
+            print(f"Waiting {wait/60:.0f} minutes for market open")
+            time.sleep(wait)
+
+        # One final poll just after the close records the closing estimate
+        while True:
+            started = time.monotonic()
+            with TRACER.span('daemon.poll') as span:
+                span['updated'] = len(self.poll())
+            if datetime.now().time() > MARKET_CLOSE:
+                break
+            time.sleep(max(0, self.interval - (time.monotonic() - started)))
+
+        print("Market closed - daemon stopping")
+        for analyzer in self.analyzers:
+            self.sheet_manager.show_comparison(analyzer.fund_name)
+        if hasattr(self.sheet_manager, 'close'):
+            self.sheet_manager.close()
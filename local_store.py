@@ -0,0 +1,265 @@
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from record_store import RecordStore, DATE_FORMAT
+from snapshot_store import DEFAULT_CACHE_DIR
+from sheet_manager import SheetManager
+
+DEFAULT_DB_PATH = os.path.join(DEFAULT_CACHE_DIR, 'nav_history.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nav_records (
+    fund_name TEXT NOT NULL,
+    date_key TEXT NOT NULL,
+    date TEXT NOT NULL,
+    calculation_time TEXT,
+    calculated_nav,
+    official_nav,
+    difference,
+    percentage_diff,
+    equity_portion,
+    PRIMARY KEY (fund_name, date_key)
+);
+CREATE TABLE IF NOT EXISTS nav_samples (
+    fund_name TEXT NOT NULL,
+    date_key TEXT NOT NULL,
+    calculation_time TEXT NOT NULL,
+    calculated_nav REAL,
+    PRIMARY KEY (fund_name, date_key, calculation_time)
+);
+"""
+
+RECORD_COLUMNS = ['date', 'calculation_time', 'calculated_nav', 'official_nav',
+                  'difference', 'percentage_diff', 'fund_name', 'equity_portion']
+
+
+def date_key(date_str):
+    """Sortable ISO key for a dd/mm/YYYY record date"""
+    return datetime.strptime(date_str, DATE_FORMAT).strftime("%Y-%m-%d")
+
+
+class SQLiteStore(RecordStore):
+    """Persistent local NAV history with an index on (fund, date)
+
+    Implements the SheetManager interface so it can replace it directly.
+    Every stored calculation is also kept as an intraday sample, so the
+    history of intraday estimates survives the daily record being rewritten.
+    Writes are committed on flush().
+    """
+    def __init__(self, path=DEFAULT_DB_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.connected = True
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _to_record(self, row):
+        record = {field: row[field] if row[field] is not None else '' for field in RECORD_COLUMNS}
+        record['row_num'] = row['rowid']
+        return record
+
+    def _select(self, where, params, suffix=""):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT rowid, {', '.join(RECORD_COLUMNS)} FROM nav_records WHERE {where} {suffix}",
+                params
+            ).fetchall()
+        return [self._to_record(row) for row in rows]
+
+    def get_sheet_for_fund(self, fund_name):
+        return None
+
+    def get_all_records(self, fund_name):
+        """Get all records for a fund in date order"""
+        return self._select("fund_name = ?", (fund_name,), "ORDER BY date_key")
+
+    def get_recent_records(self, fund_name, limit):
+        records = self._select("fund_name = ?", (fund_name,), f"ORDER BY date_key DESC LIMIT {int(limit)}")
+        return list(reversed(records))
+
+    def get_record(self, fund_name, record_date):
+        """Indexed lookup of one fund's record for a date"""
+        records = self._select("fund_name = ? AND date_key = ?", (fund_name, date_key(record_date)))
+        return records[0] if records else None
+
+    def _values(self, fund_name, record_data):
+        return (
+            fund_name,
+            date_key(record_data['date']),
+            record_data['date'],
+            record_data.get('calculation_time', ''),
+            record_data.get('calculated_nav', ''),
+            record_data.get('official_nav', ''),
+            record_data.get('difference', ''),
+            record_data.get('percentage_diff', ''),
+            record_data.get('equity_portion', ''),
+        )
+
+    def _add_sample(self, fund_name, record_data):
+        if record_data.get('calculated_nav') in (None, '') or not record_data.get('calculation_time'):
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO nav_samples VALUES (?, ?, ?, ?)",
+            (fund_name, date_key(record_data['date']), record_data['calculation_time'],
+             float(record_data['calculated_nav']))
+        )
+
+    def bulk_upsert(self, fund_name, records):
+        """Insert or replace many records in one statement"""
+        with self._lock:
+            self._conn.executemany(
+                """INSERT INTO nav_records
+                   (fund_name, date_key, date, calculation_time, calculated_nav,
+                    official_nav, difference, percentage_diff, equity_portion)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (fund_name, date_key) DO UPDATE SET
+                       date = excluded.date,
+                       calculation_time = excluded.calculation_time,
+                       calculated_nav = excluded.calculated_nav,
+                       official_nav = excluded.official_nav,
+                       difference = excluded.difference,
+                       percentage_diff = excluded.percentage_diff,
+                       equity_portion = excluded.equity_portion""",
+                [self._values(fund_name, record) for record in records]
+            )
+            for record in records:
+                self._add_sample(fund_name, record)
+
+    def add_record(self, fund_name, record_data):
+        """Add a new record"""
+        self.bulk_upsert(fund_name, [record_data])
+
+    def update_record(self, fund_name, row_num, record_data):
+        """Update an existing record by its rowid"""
+        with self._lock:
+            values = self._values(fund_name, record_data)
+            self._conn.execute(
+                """UPDATE nav_records SET
+                       fund_name = ?, date_key = ?, date = ?, calculation_time = ?, calculated_nav = ?,
+                       official_nav = ?, difference = ?, percentage_diff = ?, equity_portion = ?
+                   WHERE rowid = ?""",
+                values + (row_num,)
+            )
+            self._add_sample(fund_name, record_data)
+
+    def update_official_nav(self, fund_name, official_nav, target_date=None):
+        """Update the official NAV for a specific fund and date"""
+        if target_date is None:
+            target_date = (date.today() - timedelta(days=1)).strftime(DATE_FORMAT)
+
+        with self._lock:
+            row = self.get_record(fund_name, target_date)
+            if row is None or (row['official_nav'] and row['official_nav'] != ''):
+                return False
+            self._fill_official_nav(row, official_nav)
+            self.update_record(fund_name, row['row_num'], row)
+            return True
+
+    def get_samples(self, fund_name, record_date):
+        """Intraday (calculation_time, calculated_nav) samples for a date"""
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute(
+                "SELECT calculation_time, calculated_nav FROM nav_samples "
+                "WHERE fund_name = ? AND date_key = ? ORDER BY calculation_time",
+                (fund_name, date_key(record_date))
+            )]
+
+    def flush(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+class MirroredStore:
+    """SQLite as the primary store with Google Sheets as an asynchronous mirror
+
+    Reads and writes go to the primary. Every record a write touches is
+    remembered by date and, on flush(), upserted into the mirror from a
+    background thread so Sheets latency never blocks the calculation.
+    """
+    def __init__(self, primary, mirror):
+        self.primary = primary
+        self.mirror = mirror
+        self._pending = {}  # fund -> {date: record}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def __getattr__(self, name):
+        # Reads (get_record, get_all_records, show_comparison, ...) use the primary
+        return getattr(self.primary, name)
+
+    def _track(self, fund_name, record_date):
+        record = self.primary.get_record(fund_name, record_date)
+        if record is not None:
+            with self._lock:
+                self._pending.setdefault(fund_name, {})[record_date] = {
+                    field: record[field] for field in RecordStore.FIELD_NAMES
+                }
+
+    def add_record(self, fund_name, record_data):
+        self.primary.add_record(fund_name, record_data)
+        self._track(fund_name, record_data['date'])
+
+    def update_record(self, fund_name, row_num, record_data):
+        self.primary.update_record(fund_name, row_num, record_data)
+        self._track(fund_name, record_data['date'])
+
+    def bulk_upsert(self, fund_name, records):
+        self.primary.bulk_upsert(fund_name, records)
+        for record in records:
+            self._track(fund_name, record['date'])
+
+    def update_official_nav(self, fund_name, official_nav, target_date=None):
+        if target_date is None:
+            target_date = (date.today() - timedelta(days=1)).strftime(DATE_FORMAT)
+        updated = self.primary.update_official_nav(fund_name, official_nav, target_date)
+        if updated:
+            self._track(fund_name, target_date)
+        return updated
+
+    def _replicate(self, pending):
+        try:
+            for fund_name, records in pending.items():
+                self.mirror.bulk_upsert(fund_name, list(records.values()))
+            self.mirror.flush()
+        except Exception as e:
+            print(f"Warning: Could not mirror records to Google Sheets ({str(e)})")
+
+    def flush(self):
+        """Commit locally and hand queued records to the mirror thread"""
+        self.primary.flush()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self._executor.submit(self._replicate, pending)
+
+    def close(self):
+        """Wait for outstanding mirror writes"""
+        self.flush()
+        self._executor.shutdown(wait=True)
+        self.primary.close()
+
+
+STORE_BACKENDS = ('sheets', 'sqlite', 'mirror')
+
+
+def open_store(backend='sheets', path=DEFAULT_DB_PATH):
+    """Create the record store for a backend name"""
+    if backend == 'sqlite':
+        return SQLiteStore(path)
+    if backend == 'sheets':
+        return SheetManager()
+    if backend == 'mirror':
+        return MirroredStore(SQLiteStore(path), SheetManager())
+    raise ValueError(f"Unknown store backend: {backend}")
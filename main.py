@@ -1,12 +1,76 @@
-from MutualFundAnalyzer import MutualFundAnalyzer
+import argparse
+from portfolio_runner import PortfolioRunner, ConcurrencyBudget, load_fund_config, print_summary
+from intraday_daemon import IntradayDaemon, DEFAULT_POLL_INTERVAL
+from local_store import STORE_BACKENDS
+from instrumentation import TRACER
+from sharding import parse_shard, run_shard, run_processes, merge_shards
+
+DEFAULT_URLS = [
+    'https://groww.in/mutual-funds/sbi-psu-fund-direct-growth',
+    'https://groww.in/mutual-funds/aditya-birla-sun-life-psu-equity-fund-direct-growth'
+    # Add more URLs as needed
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Estimate intraday mutual fund NAVs")
+    parser.add_argument('urls', nargs='*', help="Groww fund URLs (defaults to the built-in list)")
+    parser.add_argument('--config', help="JSON file with funds and concurrency budget")
+    parser.add_argument('--fund-workers', type=int, default=4, help="funds analyzed concurrently")
+    parser.add_argument('--http-workers', type=int, default=32, help="concurrent HTTP requests across all funds")
+    parser.add_argument('--browsers', type=int, default=2, help="headless browsers shared across funds")
+    parser.add_argument('--execution', choices=['threaded', 'async'], default='threaded',
+                        help="quote fetching engine")
+    parser.add_argument('--store', choices=STORE_BACKENDS, default='sheets',
+                        help="where results are kept: Google Sheets, local SQLite, or SQLite mirrored to Sheets")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running through market hours, updating NAVs incrementally")
+    parser.add_argument('--interval', type=int, default=DEFAULT_POLL_INTERVAL,
+                        help="seconds between quote polls in daemon mode")
+    parser.add_argument('--deadline', type=float,
+                        help="seconds to wait for quotes; the NAV is estimated from the holdings priced by then")
+    parser.add_argument('--refine-wait', type=float,
+                        help="with --deadline, extra seconds a low-coverage estimate waits for late quotes")
+    parser.add_argument('--metrics', action='store_true',
+                        help="print per-stage and per-request timings at the end of the run")
+    parser.add_argument('--shard', type=parse_shard, metavar='I/N',
+                        help="only analyze shard I of N and write its results to --shard-output instead of the store")
+    parser.add_argument('--shard-output', help="result file for --shard (default nav_shard_I_of_N.json)")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="split the funds across this many local processes and merge their results")
+    parser.add_argument('--merge', nargs='+', metavar='RESULT',
+                        help="write shard result files to the store in one pass and print the combined summary")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    urls = [
-        'https://groww.in/mutual-funds/sbi-psu-fund-direct-growth',
-        'https://groww.in/mutual-funds/aditya-birla-sun-life-psu-equity-fund-direct-growth'
-        # Add more URLs as needed
-    ]
-
-    for url in urls:
-        analyzer = MutualFundAnalyzer(url, base_workers=5)
-        analyzer.run_analysis()
+    args = parse_args()
+    options = {'base_workers': 5, 'execution_mode': args.execution, 'deadline': args.deadline,
+               'refine_wait': args.refine_wait}
+
+    try:
+        if args.daemon:
+            funds = load_fund_config(args.config)[0] if args.config else args.urls or DEFAULT_URLS
+            urls = [fund['url'] if isinstance(fund, dict) else fund for fund in funds]
+            IntradayDaemon(urls, args.interval, args.store, **options).run()
+        elif args.merge:
+            print_summary(merge_shards(args.merge, args.store))
+        else:
+            if args.config:
+                funds, budget = load_fund_config(args.config)
+            else:
+                funds = args.urls or DEFAULT_URLS
+                budget = ConcurrencyBudget(args.fund_workers, args.http_workers, args.browsers)
+            funds = [fund if isinstance(fund, dict) else {'url': fund} for fund in funds]
+
+            if args.shard:
+                shard_index, shard_count = args.shard
+                run_shard(funds, shard_index, shard_count, budget, args.store, args.shard_output, **options)
+            elif args.processes > 1:
+                print_summary(run_processes(funds, args.processes, budget, args.store, **options))
+            else:
+                print_summary(PortfolioRunner(funds, budget, args.store, **options).run())
+    finally:
+        if args.metrics:
+            TRACER.print_summary()
+        TRACER.close()
@@ -0,0 +1,63 @@
+"""Read-only commands over stored NAV records
+
+Loads only the record store, so it starts quickly enough to call from
+schedulers and short-lived containers:
+
+    python nav_cli.py history sbi-psu-fund-direct-growth --limit 10
+    python nav_cli.py last "Sbi Psu Fund" --store sqlite
+"""
+import argparse
+from fund_page import fund_name_from_url
+from local_store import open_store, STORE_BACKENDS
+
+
+def resolve_fund_name(fund):
+    """Accept a stored fund name, a Groww URL or its last path segment"""
+    if '/' in fund or fund.endswith('-direct-growth'):
+        return fund_name_from_url(fund.rstrip('/'))
+    return fund
+
+
+def show_history(store, fund_name, limit):
+    store.show_comparison(fund_name, limit)
+
+
+def show_last(store, fund_name):
+    records = store.get_recent_records(fund_name, 1)
+    if not records:
+        print(f"No historical data found for {fund_name}")
+        return
+
+    record = records[-1]
+    print(f"{fund_name} on {record['date']} at {record['calculation_time'] or '-'}")
+    print(f"Calculated NAV: {record['calculated_nav'] or '-'}")
+    print(f"Official NAV:   {record['official_nav'] or '-'}")
+    if record['percentage_diff'] not in (None, ''):
+        print(f"Difference:     {record['difference']} ({record['percentage_diff']}%)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Inspect stored NAV history without running an analysis")
+    parser.add_argument('--store', choices=STORE_BACKENDS, default='sheets',
+                        help="record store to read; mirror reads its local SQLite copy")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    history = commands.add_parser('history', help="show recent records for a fund")
+    history.add_argument('fund', help="fund name or Groww URL")
+    history.add_argument('--limit', type=int, default=10, help="number of records to show")
+
+    last = commands.add_parser('last', help="show the latest record for a fund")
+    last.add_argument('fund', help="fund name or Groww URL")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Reads never touch the Sheets mirror, so skip authenticating to it
+    store = open_store('sqlite' if args.store == 'mirror' else args.store)
+    fund_name = resolve_fund_name(args.fund)
+
+    if args.command == 'history':
+        show_history(store, fund_name, args.limit)
+    else:
+        show_last(store, fund_name)
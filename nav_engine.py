@@ -0,0 +1,174 @@
+import threading
+import numpy as np
+
+
+class NavEngine:
+    """Vectorised NAV evaluation for many funds over a shared ticker universe
+
+    Each fund is a sparse row of holding weights (corpus_per / 100) over the
+    universe of companies held by any tracked fund, stored as COO triplets.
+    Current and previous prices live in NumPy arrays indexed by company, so
+    evaluating every fund is one weighted scatter-add per price vector.
+    The per-fund weighted sums are kept afterwards and price updates adjust
+    them by the delta of only the companies whose price changed.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.companies = {}  # company -> column
+        self.funds = {}  # fund_name -> row
+        self._holdings = {}  # fund_name -> [(column, weight)]
+
+        self.current = np.zeros(0)
+        self.previous = np.zeros(0)
+        self.priced = np.zeros(0, dtype=bool)
+        self.last_nav = np.zeros(0)
+        self.equity_portion = np.zeros(0)
+
+        self._matrix = None  # (rows, cols, weights) built lazily
+        self._by_column = None  # column -> (rows, weights), for incremental updates
+        self._sums = None  # (current, previous) weighted sums per fund
+
+    def _column(self, company):
+        column = self.companies.get(company)
+        if column is None:
+            column = len(self.companies)
+            self.companies[company] = column
+            self.current = np.append(self.current, 0.0)
+            self.previous = np.append(self.previous, 0.0)
+            self.priced = np.append(self.priced, False)
+        return column
+
+    def add_fund(self, fund_name, holdings, last_nav=None, equity_portion=1.0):
+        """Register or replace a fund given (company, corpus_per) pairs"""
+        with self._lock:
+            row = self.funds.get(fund_name)
+            if row is None:
+                row = len(self.funds)
+                self.funds[fund_name] = row
+                self.last_nav = np.append(self.last_nav, 0.0)
+                self.equity_portion = np.append(self.equity_portion, 1.0)
+
+            self._holdings[fund_name] = [
+                (self._column(company), (corpus_per or 0) / 100)
+                for company, corpus_per in holdings
+            ]
+            self.last_nav[row] = last_nav or 0.0
+            self.equity_portion[row] = equity_portion if equity_portion is not None else 1.0
+            self._matrix = None
+            self._by_column = None
+            self._sums = None
+
+    def _weights(self):
+        if self._matrix is None:
+            rows, cols, weights = [], [], []
+            for fund_name, holdings in self._holdings.items():
+                row = self.funds[fund_name]
+                for column, weight in holdings:
+                    rows.append(row)
+                    cols.append(column)
+                    weights.append(weight)
+            self._matrix = (
+                np.array(rows, dtype=np.intp),
+                np.array(cols, dtype=np.intp),
+                np.array(weights, dtype=float),
+            )
+        return self._matrix
+
+    def _column_weights(self):
+        if self._by_column is None:
+            rows, cols, weights = self._weights()
+            order = np.argsort(cols, kind='stable')
+            rows, cols, weights = rows[order], cols[order], weights[order]
+            bounds = np.searchsorted(cols, np.arange(len(self.companies) + 1))
+            self._by_column = [
+                (rows[bounds[c]:bounds[c + 1]], weights[bounds[c]:bounds[c + 1]])
+                for c in range(len(self.companies))
+            ]
+        return self._by_column
+
+    def update_prices(self, prices):
+        """Apply {company: (current, previous)}; None marks a company as unpriced
+
+        Returns the set of fund names whose NAV inputs changed.
+        """
+        with self._lock:
+            changed_columns = []
+            for company, pair in prices.items():
+                column = self._column(company)
+                old = (self.current[column], self.previous[column]) if self.priced[column] else None
+                if pair is not None:
+                    pair = (float(pair[0]), float(pair[1]))
+                if pair == old:
+                    continue
+
+                if self._sums is not None and column < len(self._column_weights()):
+                    rows, weights = self._column_weights()[column]
+                    new_current, new_previous = pair if pair is not None else (0.0, 0.0)
+                    old_current, old_previous = old if old is not None else (0.0, 0.0)
+                    np.add.at(self._sums[0], rows, weights * (new_current - old_current))
+                    np.add.at(self._sums[1], rows, weights * (new_previous - old_previous))
+
+                if pair is None:
+                    self.priced[column] = False
+                else:
+                    self.current[column], self.previous[column] = pair
+                    self.priced[column] = True
+                changed_columns.append(column)
+
+            return self._funds_holding(changed_columns)
+
+    def _funds_holding(self, columns):
+        columns = set(columns)
+        return {
+            fund_name for fund_name, holdings in self._holdings.items()
+            if any(column in columns for column, _ in holdings)
+        }
+
+    def percent_changes(self):
+        """Percent change of every fund's priced holdings, indexed by fund row"""
+        with self._lock:
+            if self._sums is None:
+                rows, cols, weights = self._weights()
+                weights = weights * self.priced[cols]
+                self._sums = (
+                    np.bincount(rows, weights=weights * self.current[cols], minlength=len(self.funds)),
+                    np.bincount(rows, weights=weights * self.previous[cols], minlength=len(self.funds)),
+                )
+            current, previous = self._sums
+
+        changes = np.zeros(len(self.funds))
+        nonzero = previous != 0
+        changes[nonzero] = (current[nonzero] - previous[nonzero]) / previous[nonzero] * 100
+        return changes
+
+    def evaluate(self):
+        """Return {fund_name: (percent_change, equity_adjusted_nav)} for all funds"""
+        changes = self.percent_changes()
+        with self._lock:
+            navs = self.last_nav * (1 + (changes * self.equity_portion) / 100)
+            return {
+                fund_name: (float(changes[row]), float(navs[row]))
+                for fund_name, row in self.funds.items()
+            }
+
+    def percent_change(self, fund_name):
+        return float(self.percent_changes()[self.funds[fund_name]])
+
+    def coverage(self, fund_name, exclude=()):
+        """(priced weight, total weight) of a fund's holdings, counting companies in `exclude` as unpriced"""
+        with self._lock:
+            holdings = self._holdings[fund_name]
+            excluded = {self.companies[company] for company in exclude if company in self.companies}
+            priced = sum(weight for column, weight in holdings if self.priced[column] and column not in excluded)
+            return priced, sum(weight for _, weight in holdings)
+
+    def unpriced(self, fund_name):
+        """Companies of a fund that currently have no price"""
+        with self._lock:
+            names = list(self.companies)  # insertion order is column order
+            return [names[column] for column, _ in self._holdings[fund_name] if not self.priced[column]]
+
+
+# Every analyzer registers its fund here so a portfolio can be evaluated
+# in one pass
+SHARED_NAV_ENGINE = NavEngine()
@@ -0,0 +1,172 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from snapshot_store import DEFAULT_CACHE_DIR
+
+DEFAULT_NEGATIVE_CACHE = os.path.join(DEFAULT_CACHE_DIR, 'negative_quotes.json')
+
+# A listing is skipped after FAILURE_THRESHOLD consecutive failures, for
+# BASE_REPROBE seconds, doubling with every further failure up to MAX_REPROBE
+FAILURE_THRESHOLD = 3
+BASE_REPROBE = 3600
+MAX_REPROBE = 7 * 24 * 3600
+
+# A run with this many failures and not a single success points at the quote
+# page itself (a layout change no longer parsed) rather than at the listings
+SUSPECT_FAILURES = 10
+
+# How long save() waits for another process's merge before writing anyway
+SAVE_LOCK_TIMEOUT = 10
+
+
+class NegativeQuoteCache:
+    """Persistent record of (ticker, exchange) listings whose quotes keep failing
+
+    Once a listing has failed `threshold` times in a row it is skipped until
+    its re-probe time. A further failed probe doubles the interval and a
+    successful one forgets the listing, so a symbol that was delisted stops
+    costing requests while one that was only briefly unavailable comes back
+    within the hour. Callers only report failures that are about the listing;
+    timeouts and connection errors belong to the host's circuit breaker.
+
+    If every quote of a run fails, nothing is skipped and the failures are
+    not saved, since a page layout change would otherwise blacklist every
+    listing at once.
+    """
+    def __init__(self, path=DEFAULT_NEGATIVE_CACHE, base_interval=BASE_REPROBE, max_interval=MAX_REPROBE,
+                 threshold=FAILURE_THRESHOLD):
+        self.path = path
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.threshold = threshold
+        self._run_successes = 0
+        self._run_failures = 0
+        self._entries = None  # "TICKER:EXCHANGE" -> {'failures', 'retry_at', 'reason'}
+        self._changes = {}  # key -> entry, or None for a forgotten listing, since the last save
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable negative quote cache ({str(e)})")
+        return {}
+
+    def _load(self):
+        # Caller holds self._lock
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _suspect(self):
+        # Caller holds self._lock
+        return self._run_successes == 0 and self._run_failures >= SUSPECT_FAILURES
+
+    def should_skip(self, ticker, exchange, now=None):
+        """True while a listing that failed repeatedly is waiting for its next probe"""
+        with self._lock:
+            entry = self._load().get(f"{ticker}:{exchange}")
+            if entry is None or self._suspect():
+                return False
+        return entry['failures'] >= self.threshold and (now or time.time()) < entry['retry_at']
+
+    def record_failure(self, ticker, exchange, reason, now=None):
+        with self._lock:
+            entries = self._load()
+            key = f"{ticker}:{exchange}"
+            failures = entries.get(key, {}).get('failures', 0) + 1
+            retry_at = 0
+            if failures >= self.threshold:
+                interval = min(self.max_interval, self.base_interval * 2 ** (failures - self.threshold))
+                retry_at = (now or time.time()) + interval
+            entries[key] = {'failures': failures, 'retry_at': retry_at, 'reason': reason}
+            self._changes[key] = entries[key]
+            self._run_failures += 1
+
+    def record_success(self, ticker, exchange):
+        with self._lock:
+            self._run_successes += 1
+            key = f"{ticker}:{exchange}"
+            if self._load().pop(key, None) is not None:
+                self._changes[key] = None
+
+    def failing(self):
+        """{"TICKER:EXCHANGE": entry} for every listing currently recorded"""
+        with self._lock:
+            return {key: dict(entry) for key, entry in self._load().items()}
+
+    def _acquire_file_lock(self, lock_path):
+        # O_EXCL creation works the same on every platform; a lock left by a
+        # crashed process is broken after SAVE_LOCK_TIMEOUT
+        deadline = time.monotonic() + SAVE_LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return
+            except FileExistsError:
+                if time.monotonic() >= deadline:
+                    print("Warning: Breaking stale negative quote cache lock")
+                    return
+                time.sleep(0.01)
+
+    def save(self):
+        """Merge this process's changes into the file on disk and write it atomically
+
+        Shard processes share the cache file, so entries other processes
+        saved since it was loaded are kept rather than overwritten.
+        """
+        with self._lock:
+            if not self._changes or not self.path:
+                return
+            if self._suspect():
+                print(f"Warning: {self._run_failures} quotes failed and none succeeded - "
+                      "not recording failures (has the quote page changed?)")
+                self._changes = {key: entry for key, entry in self._changes.items() if entry is None}
+                if not self._changes:
+                    return
+            directory = os.path.dirname(self.path) or '.'
+            lock_path = f"{self.path}.lock"
+            try:
+                os.makedirs(directory, exist_ok=True)
+                self._acquire_file_lock(lock_path)
+                try:
+                    entries = self._read()
+                    for key, entry in self._changes.items():
+                        if entry is None:
+                            entries.pop(key, None)
+                        else:
+                            entries[key] = entry
+                    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                    try:
+                        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                            json.dump(entries, f, indent=1, sort_keys=True)
+                        os.replace(tmp_path, self.path)
+                    except BaseException:
+                        os.remove(tmp_path)
+                        raise
+                finally:
+                    try:
+                        os.remove(lock_path)
+                    except FileNotFoundError:
+                        pass
+                self._entries = entries
+                self._changes = {}
+            except OSError as e:
+                print(f"Warning: Could not save negative quote cache ({str(e)})")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_negative_cache():
+    """Process-wide negative cache, loaded on first use"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = NegativeQuoteCache()
+        return _default_cache
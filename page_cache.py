@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from fund_page import FundPage
+from snapshot_store import DEFAULT_CACHE_DIR
+
+
+def payload_hash(text):
+    """Hash of a page's raw __NEXT_DATA__ payload"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class PageCacheEntry:
+    """A parsed fund page with the validators and payload hash it was built from
+
+    `mapping` holds the analyzer's derived holdings data (cleaned company
+    names, weights, holdings hash and resolved tickers) so an unchanged
+    page does not have to be mapped again.
+    """
+    def __init__(self, url, payload_hash, page, etag=None, last_modified=None, mapping=None, fetched_at=None):
+        self.url = url
+        self.payload_hash = payload_hash
+        self.page = page
+        self.etag = etag
+        self.last_modified = last_modified
+        self.mapping = mapping
+        self.fetched_at = fetched_at or datetime.now()
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'payload_hash': self.payload_hash,
+            'page': self.page.to_dict(),
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'mapping': self.mapping,
+            'fetched_at': self.fetched_at.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['url'],
+            data['payload_hash'],
+            FundPage.from_dict(data['page']),
+            data.get('etag'),
+            data.get('last_modified'),
+            data.get('mapping'),
+            datetime.fromisoformat(data['fetched_at']),
+        )
+
+
+class PageCache:
+    """On-disk fund pages revalidated with conditional requests"""
+    def __init__(self, directory=None):
+        self.directory = os.path.join(directory or DEFAULT_CACHE_DIR, 'pages')
+
+    def _path(self, url):
+        return os.path.join(self.directory, f"{hashlib.sha256(url.encode('utf-8')).hexdigest()[:24]}.json")
+
+    def load(self, url):
+        """Return the cached entry for a URL, or None"""
+        try:
+            with open(self._path(url), encoding='utf-8') as f:
+                entry = PageCacheEntry.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Warning: Ignoring unreadable page cache for {url} ({str(e)})")
+            return None
+        return entry if entry.url == url else None
+
+    def save(self, entry):
+        """Write an entry atomically"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(entry.url)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def conditional_headers(self, entry):
+        """If-None-Match / If-Modified-Since headers for revalidating an entry"""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
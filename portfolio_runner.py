@@ -0,0 +1,113 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from MutualFundAnalyzer import MutualFundAnalyzer
+from browser_pool import BrowserPool
+from http_client import HttpClient, scaled_rate_limits
+from local_store import open_store
+
+
+class ConcurrencyBudget:
+    """Global limits shared by every fund in a portfolio run"""
+    def __init__(self, funds=4, http=32, browsers=2):
+        self.funds = funds
+        self.http = http
+        self.browsers = browsers
+
+
+def load_fund_config(path):
+    """Read fund entries from a JSON config
+
+    The file is either a list of fund URLs or an object with a "funds" list
+    whose entries are URLs or {"url": ..., "equity_portion": ...} objects,
+    and an optional "concurrency" object with ConcurrencyBudget fields.
+    """
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+
+    if isinstance(config, list):
+        config = {'funds': config}
+
+    funds = [
+        entry if isinstance(entry, dict) else {'url': entry}
+        for entry in config.get('funds', [])
+    ]
+    return funds, ConcurrencyBudget(**config.get('concurrency', {}))
+
+
+class PortfolioRunner:
+    """Runs many funds concurrently with shared sessions
+
+    The record store (Google is authenticated once for the Sheets backends)
+    is shared by every analyzer and serialises its own calls. The HTTP client and browser
+    pool are shared too, so the budget caps outbound requests and Chrome
+    instances across all funds rather than per fund.
+    """
+    def __init__(self, funds, budget=None, store_backend='sheets', store=None, rate_share=1.0, **analyzer_options):
+        self.funds = [f if isinstance(f, dict) else {'url': f} for f in funds]
+        self.budget = budget or ConcurrencyBudget()
+        self.analyzer_options = analyzer_options
+
+        self.sheet_manager = store if store is not None else open_store(store_backend)
+        # An injected store belongs to the caller, which may still need to read it
+        self._owns_store = store is None
+        # rate_share < 1 when other processes share the same per-host limits
+        self.http = HttpClient(
+            pool_size=self.budget.http,
+            max_in_flight=self.budget.http,
+            rate_limits=scaled_rate_limits(rate_share) if rate_share != 1.0 else None
+        )
+        self.browser_pool = BrowserPool(size=self.budget.browsers)
+
+    @classmethod
+    def from_config(cls, path, store_backend='sheets', **analyzer_options):
+        funds, budget = load_fund_config(path)
+        return cls(funds, budget, store_backend, **analyzer_options)
+
+    def _run_fund(self, fund):
+        options = dict(self.analyzer_options)
+        options.update({k: v for k, v in fund.items() if k != 'url'})
+        analyzer = MutualFundAnalyzer(
+            fund['url'],
+            http=self.http,
+            sheet_manager=self.sheet_manager,
+            browser_pool=self.browser_pool,
+            **options
+        )
+        try:
+            return analyzer.run_analysis()
+        except Exception as e:
+            print(f"Error analyzing {analyzer.fund_name}: {str(e)}")
+            return analyzer._summary("error")
+
+    def run(self):
+        """Analyze every fund and return one summary dict per fund, in input order"""
+        try:
+            with ThreadPoolExecutor(max_workers=self.budget.funds) as executor:
+                summaries = list(executor.map(self._run_fund, self.funds))
+        finally:
+            self.browser_pool.close()
+
+        try:
+            self.sheet_manager.flush()
+            if self._owns_store and hasattr(self.sheet_manager, 'close'):
+                self.sheet_manager.close()
+        except Exception as e:
+            print(f"Failed to update sheet: {str(e)}")
+        return summaries
+
+
+def print_summary(summaries):
+    print("\nPortfolio Summary:")
+    print("{:<45} {:<20} {:<12} {:<12} {:<9} {:<8}".format(
+        'Fund', 'Status', 'Last NAV', 'Calc NAV', 'Coverage', 'Stored'))
+    print("-" * 110)
+    for summary in summaries:
+        coverage = summary.get('coverage')
+        print("{:<45} {:<20} {:<12} {:<12} {:<9} {:<8}".format(
+            summary['fund_name'],
+            summary['status'],
+            summary['last_nav'] if summary['last_nav'] is not None else '-',
+            f"{summary['calculated_nav']:.4f}" if summary['calculated_nav'] is not None else '-',
+            f"{coverage:.1%}" if coverage is not None else '-',
+            'yes' if summary['stored'] else 'no'
+        ))
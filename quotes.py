@@ -0,0 +1,327 @@
+from concurrent.futures import wait, FIRST_COMPLETED
+from datetime import datetime
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from http_client import get_http_client, BlockedResponseError, CircuitOpenError
+from instrumentation import TRACER
+
+# Overridable so benchmarks can point quote requests at a local stub server
+GOOGLE_FINANCE_QUOTE_URL = os.environ.get(
+    'NAV_QUOTE_URL_TEMPLATE', 'https://www.google.com/finance/quote/{ticker}:{exchange}?hl=en'
+)
+
+# Class names used by Google Finance for the headline price and the
+# "Previous close" value in the key stats table
+CURRENT_PRICE_CLASS = "YMlKec fxKbKc"
+PREVIOUS_CLOSE_CLASS = "P6K39c"
+
+# Google serves these instead of a quote when it suspects automated traffic
+BLOCKED_MARKERS = ('/sorry/', 'unusual traffic')
+
+# Quotes older than this are refetched; one run finishes well within it
+DEFAULT_QUOTE_TTL = 300
+
+# Lookup outcome -> QuoteCache counter attribute
+LOOKUP_COUNTERS = {'hit': 'hits', 'miss': 'misses', 'coalesced': 'coalesced'}
+
+CURRENCY_SYMBOLS = {
+    '₹': 'INR',
+    '$': 'USD',
+    '€': 'EUR',
+    '£': 'GBP',
+}
+
+
+class Quote:
+    """Prices for a single ticker parsed from one quote page"""
+    def __init__(self, ticker, exchange, current_price, previous_close, currency=None, timestamp=None):
+        self.ticker = ticker
+        self.exchange = exchange
+        self.current_price = current_price
+        self.previous_close = previous_close
+        self.currency = currency
+        self.timestamp = timestamp or datetime.now()
+
+    def is_complete(self):
+        """Both prices are needed to compute a holding's contribution"""
+        return self.current_price is not None and self.previous_close is not None
+
+    def __repr__(self):
+        return (f"Quote({self.ticker}:{self.exchange}, current={self.current_price}, "
+                f"previous_close={self.previous_close}, currency={self.currency})")
+
+
+def _parse_price(text):
+    """Split a displayed price like '₹1,234.50' into (value, currency)"""
+    text = text.strip()
+    currency = None
+    if text and not (text[0].isdigit() or text[0] in '+-.'):
+        currency = CURRENCY_SYMBOLS.get(text[0])
+        text = text[1:]
+    return float(text.replace(",", "")), currency
+
+
+def quote_host():
+    return urlparse(GOOGLE_FINANCE_QUOTE_URL).hostname or ''
+
+
+def is_blocked_page(url, html):
+    """True for a CAPTCHA / unusual-traffic page served in place of a quote"""
+    return '/sorry/' in (url or '') or any(marker in html[:20000] for marker in BLOCKED_MARKERS)
+
+
+def listing_failure_reason(error):
+    """Reason to hold a request error against the listing, or None
+
+    Only client errors such as 404 are about the listing. Timeouts,
+    connection errors, throttling and server errors are about the host and
+    are left to its circuit breaker.
+    """
+    status = getattr(error, 'status', None)  # aiohttp
+    response = getattr(error, 'response', None)  # requests
+    if status is None and response is not None:
+        status = response.status_code
+    if status is not None and 400 <= status < 500 and status not in (408, 429):
+        return f"HTTP {status}"
+    return None
+
+
+def record_quote_result(negative_cache, http, ticker, exchange, quote, reason):
+    """Forget a listing that quoted; remember one that failed while its host was healthy
+
+    Failures while the host's circuit is open say nothing about the listing
+    itself, so they are not held against it; neither is a failure without a
+    reason.
+    """
+    if negative_cache is None:
+        return
+    if quote is not None and quote.is_complete():
+        negative_cache.record_success(ticker, exchange)
+    elif reason is not None and not http.circuit_open(quote_host()):
+        negative_cache.record_failure(ticker, exchange, reason)
+
+
+def stale_quote(quote_cache, http, candidates, eod_source=None):
+    """Alternate quote for a listing while the quote host's circuit is open
+
+    The last complete quote seen in this process is preferred. A one-shot
+    run has none, so the listing is then priced flat at its last bhavcopy
+    close, which keeps the holding in the NAV without inventing a move.
+    """
+    if not http.circuit_open(quote_host()):
+        return None
+    for ticker, exchange in candidates:
+        quote = quote_cache.last_good(ticker, exchange)
+        if quote is not None:
+            TRACER.count('quote.stale')
+            return quote
+    if eod_source is not None:
+        for ticker, exchange in candidates:
+            quote = eod_source.last_close_quote(ticker, exchange, datetime.now().date())
+            if quote is not None:
+                TRACER.count('quote.stale_eod')
+                return quote
+    return None
+
+
+def parse_quote_page(html, ticker, exchange):
+    """Extract current price, previous close, currency and timestamp from a quote page"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+
+    current_price = previous_close = currency = timestamp = None
+
+    current_element = soup.find(class_=CURRENT_PRICE_CLASS)
+    if current_element:
+        current_price, currency = _parse_price(current_element.text)
+
+    previous_element = soup.find(class_=PREVIOUS_CLOSE_CLASS)
+    if previous_element:
+        previous_close, previous_currency = _parse_price(previous_element.text)
+        currency = currency or previous_currency
+
+    # The quote container carries machine readable metadata when available
+    container = soup.find(attrs={'data-last-price': True})
+    if container:
+        currency = container.get('data-currency-code') or currency
+        market_ts = container.get('data-last-normal-market-timestamp')
+        if market_ts and market_ts.isdigit():
+            timestamp = datetime.fromtimestamp(int(market_ts))
+
+    if current_price is None and previous_close is None:
+        return None
+
+    return Quote(ticker, exchange, current_price, previous_close, currency, timestamp)
+
+
+class QuoteFetcher:
+    """Downloads a Google Finance quote page once and returns a structured Quote"""
+    def __init__(self, http=None, timeout=10, negative_cache=None):
+        self.http = http if http is not None else get_http_client()
+        self.timeout = timeout
+        self.negative_cache = negative_cache
+
+    def fetch(self, ticker, exchange):
+        """Fetch a quote for ticker on exchange, or None if it could not be parsed
+
+        CircuitOpenError and BlockedResponseError are raised rather than
+        returned as None: they say nothing about the listing, so the quote
+        cache must not remember them as a failed lookup.
+        """
+        quote = None
+        reason = 'no price on page'
+        try:
+            url = GOOGLE_FINANCE_QUOTE_URL.format(ticker=ticker, exchange=exchange)
+            response = self.http.get(url, is_blocked=is_blocked_page, timeout=self.timeout)
+            response.raise_for_status()
+            quote = parse_quote_page(response.text, ticker, exchange)
+        except (CircuitOpenError, BlockedResponseError):
+            raise
+        except Exception as e:
+            print(f"Error getting quote for {ticker} on {exchange}: {str(e)}")
+            reason = listing_failure_reason(e)
+        record_quote_result(self.negative_cache, self.http, ticker, exchange, quote, reason)
+        return quote
+
+
+def hedged_fetch(executor, fetch, candidates, delay):
+    """Race listings for one holding and return the first complete quote
+
+    The first candidate is requested immediately. The next one is started
+    once the outstanding requests have run for `delay` seconds without a
+    result, or straight away if they all failed. When a complete quote
+    arrives the remaining futures are cancelled; a blocking request that has
+    already started cannot be interrupted, so its result is discarded.
+    """
+    remaining = list(candidates)
+    pending = set()
+
+    def launch():
+        pending.add(executor.submit(fetch, *remaining.pop(0)))
+
+    launch()
+    while pending:
+        done, pending = wait(pending, timeout=delay if remaining else None, return_when=FIRST_COMPLETED)
+        for future in done:
+            quote = future.result()
+            if quote is not None and quote.is_complete():
+                for loser in pending:
+                    loser.cancel()
+                return quote
+        if remaining and (not done or not pending):
+            launch()
+    return None
+
+
+class QuoteCache:
+    """Run-scoped quote cache keyed by (ticker, exchange)
+
+    Requests for a listing that is already being fetched are coalesced: the
+    caller waits for the in-flight fetch instead of starting another one.
+    Failed lookups are cached as None for the same TTL so a dead listing is
+    not retried by every fund that holds it. A fetch that raises is not
+    cached, so a listing rejected while its host was unavailable is retried.
+    """
+    def __init__(self, ttl=DEFAULT_QUOTE_TTL):
+        self.ttl = ttl
+        self._entries = {}  # (ticker, exchange) -> (stored_at, quote)
+        self._last_good = {}  # (ticker, exchange) -> last complete quote, kept past the TTL
+        self._in_flight = {}  # (ticker, exchange) -> threading.Event
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _fresh_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+            return entry
+        return None
+
+    def get(self, ticker, exchange):
+        """Return (found, quote) without fetching"""
+        with self._lock:
+            entry = self._fresh_entry((ticker, exchange))
+        if entry is None:
+            return False, None
+        return True, entry[1]
+
+    def put(self, ticker, exchange, quote):
+        with self._lock:
+            self._store((ticker, exchange), quote)
+
+    def _store(self, key, quote):
+        # Caller holds self._lock
+        self._entries[key] = (time.monotonic(), quote)
+        if quote is not None and quote.is_complete():
+            self._last_good[key] = quote
+
+    def last_good(self, ticker, exchange):
+        """Most recent complete quote for a listing regardless of age, or None"""
+        with self._lock:
+            return self._last_good.get((ticker, exchange))
+
+    def _count(self, outcome):
+        # Caller holds self._lock
+        attr = LOOKUP_COUNTERS[outcome]
+        setattr(self, attr, getattr(self, attr) + 1)
+        TRACER.count(f'quote_cache.{outcome}')
+
+    def record_lookup(self, outcome):
+        """Count a lookup resolved outside get_or_fetch as 'hit', 'miss' or 'coalesced'"""
+        with self._lock:
+            self._count(outcome)
+
+    def get_or_fetch(self, ticker, exchange, fetch):
+        """Return a cached quote, wait for an in-flight fetch, or call fetch(ticker, exchange)"""
+        with TRACER.span('quote', ticker=ticker, exchange=exchange) as span:
+            return self._get_or_fetch(ticker, exchange, fetch, span)
+
+    def _get_or_fetch(self, ticker, exchange, fetch, span):
+        key = (ticker, exchange)
+        with self._lock:
+            entry = self._fresh_entry(key)
+            if entry is not None:
+                self._count('hit')
+                span['cache'] = 'hit'
+                return entry[1]
+            event = self._in_flight.get(key)
+            owner = event is None
+            if owner:
+                event = threading.Event()
+                self._in_flight[key] = event
+                self._count('miss')
+            else:
+                self._count('coalesced')
+        span['cache'] = 'miss' if owner else 'coalesced'
+
+        if not owner:
+            event.wait()
+            with self._lock:
+                entry = self._fresh_entry(key)
+            return entry[1] if entry is not None else None
+
+        try:
+            quote = fetch(ticker, exchange)
+            with self._lock:
+                self._store(key, quote)
+            return quote
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            event.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._last_good.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced}
+
+
+# Shared by every analyzer in the process so overlapping holdings across
+# funds are only scraped once per run
+SHARED_QUOTE_CACHE = QuoteCache()
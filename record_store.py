@@ -0,0 +1,84 @@
+from datetime import date, timedelta
+
+DATE_FORMAT = "%d/%m/%Y"
+
+
+class RecordStore:
+    """Behaviour shared by every NAV record backend
+
+    Backends implement get_all_records, get_todays_record, add_record,
+    update_record, update_official_nav, bulk_upsert and flush; records are
+    dicts keyed by FIELD_NAMES plus the backend's row_num.
+    """
+    FIELD_NAMES = [
+        'date', 'calculation_time', 
+        'calculated_nav', 'official_nav', 
+        'difference', 'percentage_diff',
+        'fund_name', 'equity_portion'
+    ]
+
+    def _fill_official_nav(self, row, official_nav):
+        """Set official NAV on a record and derive the difference if calculated_nav exists"""
+        row['official_nav'] = str(official_nav)
+
+        if row['calculated_nav'] and row['calculated_nav'] != '':
+            calculated = float(row['calculated_nav'])
+            diff = official_nav - calculated
+            percentage_diff = (diff / calculated) * 100
+
+            row['difference'] = str(round(diff, 4))
+            row['percentage_diff'] = str(round(percentage_diff, 4))
+
+    def get_previous_calculation(self, fund_name):
+        """Get yesterday's calculation for a fund"""
+        yesterday = (date.today() - timedelta(days=1)).strftime(DATE_FORMAT)
+        row = self.get_record(fund_name, yesterday)
+        
+        if row is None:
+            return None
+        return {
+            'calculated_nav': float(row['calculated_nav']) if row['calculated_nav'] else None,
+            'official_nav': float(row['official_nav']) if row['official_nav'] else None
+        }
+
+    def get_record(self, fund_name, record_date):
+        """Get the record for a date, or None"""
+        for row in reversed(self.get_all_records(fund_name)):
+            if row['date'] == record_date:
+                return row
+        return None
+
+    def get_todays_record(self, fund_name, today_date):
+        """Get today's existing record if it exists"""
+        return self.get_record(fund_name, today_date)
+
+    def get_recent_records(self, fund_name, limit):
+        """The latest `limit` records in chronological order"""
+        return self.get_all_records(fund_name)[-limit:]
+    
+    def show_comparison(self, fund_name, limit=3):
+        """Show the latest `limit` records for a fund"""
+        print(f"\nHistorical Comparison for {fund_name}:")
+        print("{:<12} {:<10} {:<12} {:<12} {:<10} {:<8}".format(
+            'Date', 'Calc NAV', 'Official NAV', 'Difference', '% Diff', 'Time'
+        ))
+        print("-" * 70)
+        
+        records = self.get_recent_records(fund_name, limit)
+        found_data = False
+
+        for row in reversed(records):
+            date_str = row['date']
+            calc_nav = row['calculated_nav'] or '-'
+            official_nav = row['official_nav'] or '-'
+            diff = row['difference'] or '-'
+            perc_diff = row['percentage_diff'] or '-'
+            time_str = row['calculation_time'] or '-'
+            
+            print("{:<12} {:<10} {:<12} {:<12} {:<10} {:<8}".format(
+                date_str, calc_nav, official_nav, diff, perc_diff, time_str
+            ))
+            found_data = True
+        
+        if not found_data:
+            print(f"No historical data found for {fund_name}")
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from fund_page import fund_name_from_url
+from instrumentation import TRACER
+from local_store import SQLiteStore, open_store
+from portfolio_runner import ConcurrencyBudget, PortfolioRunner
+from record_store import RecordStore, DATE_FORMAT
+from snapshot_store import DEFAULT_CACHE_DIR
+
+# Result files written by --shard runs and read back by --merge
+SHARD_OUTPUT_TEMPLATE = 'nav_shard_{index}_of_{count}.json'
+DEFAULT_SHARD_DIR = os.path.join(DEFAULT_CACHE_DIR, 'shards')
+
+
+def shard_for(fund_name, shard_count):
+    """Deterministic shard of a fund, stable across processes and machines"""
+    digest = hashlib.sha256(fund_name.encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) % shard_count
+
+
+def select_shard(funds, shard_index, shard_count):
+    """Fund entries ({'url': ...} dicts) that belong to one shard"""
+    return [fund for fund in funds if shard_for(fund_name_from_url(fund['url']), shard_count) == shard_index]
+
+
+def parse_shard(value):
+    """Parse 'I/N' into (index, count)"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like I/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be in 0..{count - 1}, got {value!r}")
+    return index, count
+
+
+class ShardStore(RecordStore):
+    """Record store for one shard that never writes to the shared backend
+
+    Each fund's existing records are copied from the source store into an
+    in-memory SQLite database on first use, so the time-of-day rules see the
+    real history. Writes only touch the copy and are collected by
+    pending_records() for the merge step to apply in one pass.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.connected = True
+        self.local = SQLiteStore(':memory:')
+        self._seeded = set()
+        self._touched = {}  # fund -> set of record dates
+
+    def _seed(self, fund_name):
+        if fund_name not in self._seeded:
+            self._seeded.add(fund_name)
+            records = self.source.get_all_records(fund_name)
+            if records:
+                self.local.bulk_upsert(fund_name, [
+                    {field: record.get(field, '') for field in self.FIELD_NAMES} for record in records
+                ])
+
+    def _track(self, fund_name, record_date):
+        self._touched.setdefault(fund_name, set()).add(record_date)
+
+    def get_sheet_for_fund(self, fund_name):
+        return None
+
+    def get_all_records(self, fund_name):
+        self._seed(fund_name)
+        return self.local.get_all_records(fund_name)
+
+    def get_recent_records(self, fund_name, limit):
+        self._seed(fund_name)
+        return self.local.get_recent_records(fund_name, limit)
+
+    def get_record(self, fund_name, record_date):
+        self._seed(fund_name)
+        return self.local.get_record(fund_name, record_date)
+
+    def add_record(self, fund_name, record_data):
+        self._seed(fund_name)
+        self.local.add_record(fund_name, record_data)
+        self._track(fund_name, record_data['date'])
+
+    def update_record(self, fund_name, row_num, record_data):
+        self._seed(fund_name)
+        self.local.update_record(fund_name, row_num, record_data)
+        self._track(fund_name, record_data['date'])
+
+    def bulk_upsert(self, fund_name, records):
+        self._seed(fund_name)
+        self.local.bulk_upsert(fund_name, records)
+        for record in records:
+            self._track(fund_name, record['date'])
+
+    def update_official_nav(self, fund_name, official_nav, target_date=None):
+        self._seed(fund_name)
+        if target_date is None:
+            target_date = (date.today() - timedelta(days=1)).strftime(DATE_FORMAT)
+        updated = self.local.update_official_nav(fund_name, official_nav, target_date)
+        if updated:
+            self._track(fund_name, target_date)
+        return updated
+
+    def pending_records(self):
+        """{fund: [record, ...]} for every record written during the run"""
+        pending = {}
+        for fund_name, dates in self._touched.items():
+            records = [self.local.get_record(fund_name, record_date) for record_date in sorted(dates)]
+            pending[fund_name] = [
+                {field: record[field] for field in self.FIELD_NAMES} for record in records if record is not None
+            ]
+        return pending
+
+    def flush(self):
+        self.local.flush()
+
+    def close(self):
+        self.local.close()
+        if hasattr(self.source, 'close'):
+            self.source.close()
+
+
+def write_shard_result(path, shard_index, shard_count, summaries, records):
+    """Write one shard's summaries and pending records atomically"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'shard': shard_index,
+            'shards': shard_count,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'summaries': summaries,
+            'records': records,
+        }, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_shard(funds, shard_index, shard_count, budget=None, store_backend='sheets', output_path=None,
+              rate_share=1.0, **analyzer_options):
+    """Analyze the funds of one shard and write its result file
+
+    Existing records are read from the store backend, but nothing is written
+    to it; the merge step applies every shard's records in one pass.
+    """
+    output_path = output_path or SHARD_OUTPUT_TEMPLATE.format(index=shard_index, count=shard_count)
+    selected = select_shard(funds, shard_index, shard_count)
+    print(f"Shard {shard_index}/{shard_count}: {len(selected)} of {len(funds)} funds")
+
+    store = ShardStore(open_store(store_backend))
+    try:
+        with TRACER.span('shard.run', shard=shard_index, shards=shard_count, funds=len(selected)):
+            runner = PortfolioRunner(selected, budget, store=store, rate_share=rate_share, **analyzer_options)
+            summaries = runner.run()
+        pending = store.pending_records()
+    finally:
+        store.close()
+    write_shard_result(output_path, shard_index, shard_count, summaries, pending)
+    return output_path
+
+
+def merge_shards(paths, store_backend='sheets'):
+    """Combine shard result files into one store write and one list of summaries
+
+    Shards are checked against each other so a missing or repeated shard is
+    reported rather than silently producing a partial portfolio.
+    """
+    results = []
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as f:
+                results.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Warning: Skipping unreadable shard result {path} ({str(e)})")
+    if not results:
+        return []
+
+    counts = {result['shards'] for result in results}
+    if len(counts) > 1:
+        print(f"Warning: Shard results come from different shard counts {sorted(counts)}")
+    seen = [result['shard'] for result in results]
+    missing = sorted(set(range(max(counts))) - set(seen))
+    if missing:
+        print(f"Warning: Missing results for shards {missing}")
+    if len(seen) != len(set(seen)):
+        print("Warning: Some shards have more than one result file; later files win")
+
+    summaries = {}
+    records = {}
+    for result in sorted(results, key=lambda result: result['shard']):
+        for summary in result['summaries']:
+            summaries[summary['fund_name']] = summary
+        for fund_name, fund_records in result['records'].items():
+            records.setdefault(fund_name, {}).update((record['date'], record) for record in fund_records)
+
+    with TRACER.span('shard.merge', shards=len(results), funds=len(records)):
+        store = open_store(store_backend)
+        try:
+            for fund_name, fund_records in records.items():
+                store.bulk_upsert(fund_name, list(fund_records.values()))
+            store.flush()
+        except Exception as e:
+            print(f"Failed to update sheet: {str(e)}")
+            for summary in summaries.values():
+                summary['stored'] = False
+        finally:
+            if hasattr(store, 'close'):
+                store.close()
+    return list(summaries.values())
+
+
+def run_processes(funds, processes, budget=None, store_backend='sheets', output_dir=DEFAULT_SHARD_DIR,
+                  **analyzer_options):
+    """Run every shard in its own local process, then merge the results
+
+    The concurrency budget and per-host rate limits are split between the
+    processes so together they stay within what a single run would use.
+    """
+    budget = budget or ConcurrencyBudget()
+    shard_budget = ConcurrencyBudget(
+        max(1, -(-budget.funds // processes)),
+        max(1, budget.http // processes),
+        max(1, budget.browsers // processes)
+    )
+    paths = [
+        os.path.join(output_dir, SHARD_OUTPUT_TEMPLATE.format(index=index, count=processes))
+        for index in range(processes)
+    ]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+    # Spawned workers start clean instead of inheriting the parent's threads and sockets
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [
+            executor.submit(run_shard, funds, index, processes, shard_budget, store_backend, path,
+                            1.0 / processes, **analyzer_options)
+            for index, path in enumerate(paths)
+        ]
+        for index, future in enumerate(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error running shard {index}/{processes}: {str(e)}")
+
+    return merge_shards([path for path in paths if os.path.exists(path)], store_backend)
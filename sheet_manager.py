@@ -0,0 +1,199 @@
+import base64
+import json
+import os
+import threading
+from datetime import date, timedelta
+from record_store import RecordStore
+from instrumentation import TRACER
+
+
+class SheetManager(RecordStore):
+    """Per-run session over the "NAV Results" spreadsheet
+
+    Worksheet handles are opened once, each fund's records are read once
+    into memory with a date -> row index, and writes are queued until
+    flush() sends them in as few API calls as possible.
+    """
+    def __init__(self):
+        try:
+            self.client = self._authenticate()
+            self.connected = True
+        except Exception as e:
+            print(f"Warning: Could not connect to Google Sheets ({str(e)}). Using local mode.")
+            self.connected = False
+
+        # Analyzers running in parallel share one session
+        self._lock = threading.RLock()
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._records = {}  # fund -> list of records, each with its sheet row_num
+        self._date_index = {}  # fund -> {date: position in records}
+        self._persisted_rows = {}  # fund -> last sheet row that exists remotely
+        self._dirty_rows = {}  # fund -> set of row_nums with unsaved changes
+
+    def _get_spreadsheet(self):
+        if self._spreadsheet is None:
+            import gspread
+            try:
+                # Open the main spreadsheet
+                self._spreadsheet = self.client.open("NAV Results")
+            except gspread.SpreadsheetNotFound:
+                # Create new spreadsheet if it doesn't exist
+                self._spreadsheet = self.client.create("NAV Results")
+        return self._spreadsheet
+        
+    def get_sheet_for_fund(self, fund_name):
+        """Get or create a worksheet for the specific fund"""
+        with self._lock:
+            if not self.connected:
+                return None  # Return None for local mode
+
+            if fund_name in self._worksheets:
+                return self._worksheets[fund_name]
+
+            import gspread
+            spreadsheet = self._get_spreadsheet()
+            try:
+                # Try to get the worksheet for this fund
+                worksheet = spreadsheet.worksheet(fund_name)
+            except gspread.WorksheetNotFound:
+                # Create new worksheet if it doesn't exist
+                worksheet = spreadsheet.add_worksheet(title=fund_name, rows=1000, cols=20)
+                worksheet.append_row(self.FIELD_NAMES)
+
+            self._worksheets[fund_name] = worksheet
+            return worksheet
+
+    def _load_records(self, fund_name):
+        """Read a fund's records once per session and index them by date"""
+        with self._lock:
+            if fund_name not in self._records:
+                records = []
+                worksheet = self.get_sheet_for_fund(fund_name)
+                if worksheet is not None:
+                    with TRACER.span('sheets.get_all_records', fund=fund_name) as span:
+                        records = worksheet.get_all_records()
+                        span['rows'] = len(records)
+                for idx, record in enumerate(records, start=2):  # Rows start at 2
+                    record['row_num'] = idx
+
+                self._records[fund_name] = records
+                self._date_index[fund_name] = {}
+                for pos, record in enumerate(records):
+                    self._date_index[fund_name].setdefault(record['date'], pos)
+                self._persisted_rows[fund_name] = len(records) + 1
+                self._dirty_rows[fund_name] = set()
+            return self._records[fund_name]
+
+    def get_record(self, fund_name, record_date):
+        """Get the record for a date using the in-memory index"""
+        with self._lock:
+            records = self._load_records(fund_name)
+            pos = self._date_index[fund_name].get(record_date)
+            return records[pos] if pos is not None else None
+
+    def update_record(self, fund_name, row_num, record_data):
+        """Update an existing record"""
+        with self._lock:
+            records = self._load_records(fund_name)
+            pos = row_num - 2
+            record = dict(record_data, row_num=row_num)
+            records[pos] = record
+            self._date_index[fund_name].setdefault(record['date'], pos)
+            self._dirty_rows[fund_name].add(row_num)
+
+    def _authenticate(self):
+        """Authenticate with Google Sheets"""
+        if 'GDRIVE_CREDENTIALS' not in os.environ:
+            raise Exception("GDRIVE_CREDENTIALS environment variable not set")
+            
+        creds_json = base64.b64decode(os.environ['GDRIVE_CREDENTIALS']).decode('utf-8')
+        creds_dict = json.loads(creds_json)
+
+        # Loaded only when Sheets is actually used; they are slow to import
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+        scope = [
+            'https://spreadsheets.google.com/feeds',
+            'https://www.googleapis.com/auth/drive'
+        ]
+        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+        return gspread.authorize(creds)
+    
+    def get_all_records(self, fund_name):
+        """Get all records from the fund's sheet as dictionaries"""
+        return self._load_records(fund_name)
+    
+    def add_record(self, fund_name, record_data):
+        """Add a new record to the fund's sheet"""
+        with self._lock:
+            records = self._load_records(fund_name)
+            row_num = len(records) + 2
+            records.append(dict(record_data, row_num=row_num))
+            self._date_index[fund_name].setdefault(record_data['date'], len(records) - 1)
+            self._dirty_rows[fund_name].add(row_num)
+
+    def update_official_nav(self, fund_name, official_nav, target_date=None):
+        """Update the official NAV for a specific fund and date"""
+        with self._lock:
+            if target_date is None:
+                target_date = (date.today() - timedelta(days=1)).strftime("%d/%m/%Y")
+
+            row = self.get_record(fund_name, target_date)
+            if row is None or (row['official_nav'] and row['official_nav'] != ''):
+                return False
+
+            self._fill_official_nav(row, official_nav)
+            self._dirty_rows[fund_name].add(row['row_num'])
+            return True
+
+    def bulk_upsert(self, fund_name, records):
+        """Queue many records, updating rows whose date already exists"""
+        with self._lock:
+            for record in records:
+                existing = self.get_record(fund_name, record['date'])
+                if existing is not None:
+                    self.update_record(fund_name, existing['row_num'], record)
+                else:
+                    self.add_record(fund_name, record)
+
+    def flush(self):
+        """Send all queued writes: one batch update for existing rows, one append per fund for new rows"""
+        with self._lock:
+            if not self.connected:
+                for dirty in self._dirty_rows.values():
+                    dirty.clear()
+                return
+
+            updates = []
+            appends = []
+            for fund_name, dirty in self._dirty_rows.items():
+                if not dirty:
+                    continue
+                worksheet = self.get_sheet_for_fund(fund_name)
+                records = self._records[fund_name]
+                persisted = self._persisted_rows[fund_name]
+
+                for row_num in sorted(r for r in dirty if r <= persisted):
+                    row_data = [records[row_num - 2].get(field, '') for field in self.FIELD_NAMES]
+                    updates.append({
+                        'range': f"'{worksheet.title}'!A{row_num}:H{row_num}",
+                        'values': [row_data]
+                    })
+
+                new_rows = [
+                    [record.get(field, '') for field in self.FIELD_NAMES]
+                    for record in records[persisted - 1:]
+                ]
+                if new_rows:
+                    appends.append((fund_name, worksheet, new_rows))
+
+            if updates:
+                with TRACER.span('sheets.batch_update', rows=len(updates)):
+                    self._get_spreadsheet().values_batch_update({'valueInputOption': 'RAW', 'data': updates})
+            for fund_name, worksheet, new_rows in appends:
+                with TRACER.span('sheets.append_rows', fund=fund_name, rows=len(new_rows)):
+                    worksheet.append_rows(new_rows)
+                self._persisted_rows[fund_name] = len(self._records[fund_name]) + 1
+            for dirty in self._dirty_rows.values():
+                dirty.clear()
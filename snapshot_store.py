@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+DEFAULT_CACHE_DIR = os.environ.get('NAV_CACHE_DIR', '.nav_cache')
+
+# AMCs publish portfolios monthly, so a snapshot older than this is refreshed
+# even if the holdings on the fund page look unchanged
+DEFAULT_MAX_AGE_DAYS = 35
+
+
+def holdings_hash(holdings):
+    """Stable hash of (company, corpus_per) pairs from a fund page"""
+    pairs = sorted((company, corpus_per) for company, corpus_per in holdings.items())
+    return hashlib.sha256(json.dumps(pairs).encode('utf-8')).hexdigest()
+
+
+def fund_cache_key(fund_name):
+    """Filesystem-safe key for a fund name"""
+    return ''.join(c if c.isalnum() else '_' for c in fund_name.lower()).strip('_')
+
+
+class FundSnapshot:
+    """Holdings and equity allocation of a fund as of one portfolio disclosure"""
+    def __init__(self, fund_name, holdings, equity_portion, fetched_at=None, source_hash=None):
+        self.fund_name = fund_name
+        self.holdings = holdings  # company -> corpus_per
+        self.equity_portion = equity_portion
+        self.fetched_at = fetched_at or datetime.now()
+        self.source_hash = source_hash or holdings_hash(holdings)
+
+    def to_dict(self):
+        return {
+            'fund_name': self.fund_name,
+            'holdings': list(self.holdings),
+            'corpus_per': self.holdings,
+            'equity_portion': self.equity_portion,
+            'fetched_at': self.fetched_at.isoformat(),
+            'source_hash': self.source_hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['fund_name'],
+            data['corpus_per'],
+            data['equity_portion'],
+            datetime.fromisoformat(data['fetched_at']),
+            data['source_hash'],
+        )
+
+
+class SnapshotStore:
+    """On-disk per-fund snapshots so Selenium only runs when a portfolio changes"""
+    def __init__(self, directory=None, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.directory = os.path.join(directory or DEFAULT_CACHE_DIR, 'snapshots')
+        self.max_age = timedelta(days=max_age_days)
+
+    def _path(self, fund_name):
+        return os.path.join(self.directory, f"{fund_cache_key(fund_name)}.json")
+
+    def load(self, fund_name):
+        """Return the stored snapshot for a fund, or None"""
+        try:
+            with open(self._path(fund_name), encoding='utf-8') as f:
+                return FundSnapshot.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            print(f"Warning: Ignoring unreadable snapshot for {fund_name} ({str(e)})")
+            return None
+
+    def save(self, snapshot):
+        """Write a snapshot atomically"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(snapshot.fund_name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def is_fresh(self, snapshot, source_hash=None, now=None):
+        """A snapshot is fresh while it is younger than max age and the holdings are unchanged"""
+        if snapshot is None:
+            return False
+        now = now or datetime.now()
+        if now - snapshot.fetched_at > self.max_age:
+            return False
+        if source_hash is not None and source_hash != snapshot.source_hash:
+            return False
+        return True
@@ -0,0 +1,71 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ticker_index import TickerIndex
+
+SECURITIES = [
+    ('Zen Technologies Limited', ['ZENTEC', '533339']),
+    ('Lux Industries Limited', ['LUXIND', '539542']),
+    ('Indowind Energy Limited', ['INDOWIND', '532894']),
+    ('Jio Financial Services Limited', ['JIOFIN', '543940']),
+    ('AU Small Finance Bank Limited', ['AUBANK', '540611']),
+    ('Zensar Technologies Limited', ['ZENSARTECH', '504067']),
+    ('Bajaj Finance Limited', ['BAJFINANCE', '500034']),
+]
+
+MAPPINGS = {
+    'ZENTECHNOLOGIESLTD': ['ZENTEC', '533339'],
+    'LUXINDUSTRIESLTD': ['LUXIND', '539542'],
+    'INDOWINDENERGYLTD': ['INDOWIND', '532894'],
+    'JIOFINANCIALSERVICESLTD': ['JIOFIN', '543940'],
+    'AUSMALLFINANCEBANKLTD': ['AUBANK', '540611'],
+}
+
+NEAR_MISSES = [
+    'Zensar Technologies Ltd',
+    'Lumax Industries Ltd',
+    'Inox Wind Energy Ltd',
+    'Geojit Financial Services Ltd',
+    'ESAF Small Finance Bank Ltd',
+    'Bajaj Holdings & Investment Ltd',
+]
+
+
+def test_near_misses_are_not_resolved_from_master_names():
+    index = TickerIndex(SECURITIES[:5])
+    for name in NEAR_MISSES:
+        assert index.resolve(name) is None, name
+
+
+def test_near_misses_are_not_resolved_from_squashed_mappings():
+    index = TickerIndex(mappings=MAPPINGS)
+    for name in NEAR_MISSES:
+        assert index.resolve(name) is None, name
+
+
+def test_spelling_variants_still_resolve():
+    index = TickerIndex(SECURITIES)
+    match = index.resolve('Zensar Technologies Ltd.')
+    assert match.tickers == ['ZENSARTECH', '504067']
+    match = index.resolve('Jio Financial Services')
+    assert match.tickers == ['JIOFIN', '543940']
+    match = index.resolve('AU Small Finance Bank Ltd')
+    assert match.tickers == ['AUBANK', '540611']
+
+
+def test_close_spelling_of_a_squashed_mapping_resolves():
+    index = TickerIndex(mappings={'BAJAJHINDUSTHANSUGARLTD': ['BAJAJHIND', '500032']})
+    match = index.resolve('Bajaj Hindusthan Sugar Limited')
+    assert match is not None and match.tickers[0] == 'BAJAJHIND'
+
+
+def test_cached_index_is_rebuilt_when_a_mapping_changes(tmp_path):
+    cache_path = str(tmp_path / 'ticker_index.pickle')
+    mappings = {'ZENSARTECHNOLOGIESLTD': ['ZENSARTECH', '504067']}
+    TickerIndex.load_or_build([], cache_path, mappings)
+
+    mappings = {'ZENSARTECHNOLOGIESLTD': ['ZENSARNEW', '504067']}
+    index = TickerIndex.load_or_build([], cache_path, mappings)
+    assert index.resolve('Zensar Technologies Ltd').tickers == ['ZENSARNEW', '504067']
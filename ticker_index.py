@@ -0,0 +1,351 @@
+import csv
+import glob
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+from array import array
+from difflib import SequenceMatcher
+from ticker_mappings import COMPANY_TICKER_MAPPINGS
+from snapshot_store import DEFAULT_CACHE_DIR
+
+# NSE (EQUITY_L.csv) and BSE (equity list) downloads are read from here
+DEFAULT_MASTER_DIR = os.environ.get('NAV_SECURITY_MASTER_DIR', 'security_master')
+DEFAULT_INDEX_CACHE = os.path.join(DEFAULT_CACHE_DIR, 'ticker_index.pickle')
+
+# Bump when the pickled layout changes so stale caches are rebuilt
+INDEX_VERSION = 2
+
+# Fuzzy matches scoring below this are treated as unmapped
+DEFAULT_MIN_CONFIDENCE = 0.88
+
+# Trigrams shared by more than this fraction of names (e.g. "IND") say little
+# about a match and are skipped so fuzzy lookups stay cheap on large masters
+COMMON_TRIGRAM_FRACTION = 0.05
+
+# Fuzzy candidates re-scored with SequenceMatcher per lookup
+CANDIDATES = 10
+
+STOPWORDS = {'LTD', 'LIMITED', 'THE', 'CO', 'COMPANY', 'CORP', 'CORPORATION', 'INC', 'PVT', 'PRIVATE', 'PLC'}
+SQUASHED_SUFFIXES = ('LIMITED', 'LTD')
+
+# Words shared by many unrelated companies. They are dropped when comparing
+# the distinctive part of two names, so "Zensar Technologies" and "Zen
+# Technologies" are compared as ZENSAR against ZEN.
+GENERIC_WORDS = {
+    'AND', 'OF', 'INDIA', 'INDUSTRIES', 'INDUSTRY', 'INDUSTRIAL', 'TECHNOLOGIES', 'TECHNOLOGY', 'TECH',
+    'ENTERPRISES', 'ENTERPRISE', 'SECURITIES', 'ENERGY', 'ENERGIES', 'POWER', 'FINANCE', 'FINANCIAL',
+    'SERVICES', 'SERVICE', 'SMALL', 'BANK', 'HOLDINGS', 'HOLDING', 'INVESTMENT', 'INVESTMENTS', 'CAPITAL',
+    'INFRASTRUCTURE', 'INFRA', 'PROJECTS', 'SOLUTIONS', 'SYSTEMS', 'SOFTWARE', 'INTERNATIONAL', 'GLOBAL',
+    'PRODUCTS', 'CHEMICALS', 'PHARMACEUTICALS', 'PHARMA', 'LABORATORIES', 'MOTORS', 'ENGINEERING',
+    'VENTURES', 'INSURANCE', 'HOUSING',
+}
+# How closely one name's leading distinctive word must match the start of the other's
+LEAD_MATCH_RATIO = 0.8
+# Generic words long enough to strip safely from the end of a squashed key
+GENERIC_SUFFIXES = tuple(sorted((word for word in GENERIC_WORDS if len(word) >= 4), key=len, reverse=True))
+DIGITS = re.compile(r'\d+')
+
+# Accepted column headers in the NSE and BSE listing files
+NAME_COLUMNS = ('NAME OF COMPANY', 'ISSUER NAME', 'SECURITY NAME', 'COMPANY NAME', 'NAME')
+NSE_COLUMNS = ('SYMBOL', 'NSE SYMBOL')
+BSE_COLUMNS = ('SECURITY CODE', 'SCRIP CODE', 'BSE CODE')
+ISIN_COLUMNS = ('ISIN NUMBER', 'ISIN NO', 'ISIN CODE', 'ISIN')
+
+
+def name_tokens(name):
+    """Upper-cased words of a company name without legal-form noise words"""
+    words = re.sub(r'[^A-Z0-9]+', ' ', str(name).upper().replace('&', ' AND ')).split()
+    return tuple(word for word in words if word not in STOPWORDS)
+
+
+def squash_name(name):
+    """Space-free key comparable with the keys in COMPANY_TICKER_MAPPINGS"""
+    key = ''.join(name_tokens(name))
+    # Keys that were already squashed still carry their suffix
+    for suffix in SQUASHED_SUFFIXES:
+        if key.endswith(suffix) and len(key) > len(suffix):
+            key = key[:-len(suffix)]
+            break
+    if key.startswith('THE') and len(key) > 3:
+        key = key[3:]
+    return key
+
+
+def distinctive_tokens(name):
+    """Name tokens without generic words, so the part that identifies the company is compared"""
+    tokens = name_tokens(name)
+    if len(tokens) == 1:
+        # A squashed key: peel generic words off its end instead
+        key = squash_name(tokens[0])
+        stripped = True
+        while stripped:
+            stripped = False
+            for suffix in GENERIC_SUFFIXES:
+                if key.endswith(suffix) and len(key) > len(suffix):
+                    key = key[:-len(suffix)]
+                    stripped = True
+                    break
+        return (key,)
+    distinctive = tuple(token for token in tokens if token not in GENERIC_WORDS)
+    return distinctive or tokens
+
+
+def leads_agree(lead, core):
+    """True if `core` starts with `lead`, allowing a small spelling difference"""
+    return SequenceMatcher(None, lead, core[:len(lead)]).ratio() >= LEAD_MATCH_RATIO
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _column(fieldnames, candidates):
+    normalized = {name.strip().upper(): name for name in fieldnames}
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized[candidate]
+    return None
+
+
+def load_security_master(paths):
+    """Merge NSE and BSE listing CSVs into {key: (name, [nse_symbol, bse_code])}
+
+    Rows are joined on ISIN when both files carry it, so a company listed on
+    both exchanges gets both tickers. Missing listings use the same
+    placeholders as COMPANY_TICKER_MAPPINGS ('UNKNOWN' and '0').
+    """
+    securities = {}
+    for path in paths:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            fieldnames = reader.fieldnames or []
+            name_col = _column(fieldnames, NAME_COLUMNS)
+            nse_col = _column(fieldnames, NSE_COLUMNS)
+            bse_col = _column(fieldnames, BSE_COLUMNS)
+            isin_col = _column(fieldnames, ISIN_COLUMNS)
+            if name_col is None or (nse_col is None and bse_col is None):
+                print(f"Warning: Skipping security master {path} (unrecognised columns)")
+                continue
+
+            for row in reader:
+                name = (row.get(name_col) or '').strip()
+                if not name:
+                    continue
+                isin = (row.get(isin_col) or '').strip() if isin_col else ''
+                key = isin or squash_name(name)
+                entry = securities.setdefault(key, (name, ['UNKNOWN', '0']))
+                if nse_col and (row.get(nse_col) or '').strip():
+                    entry[1][0] = row[nse_col].strip()
+                if bse_col and (row.get(bse_col) or '').strip():
+                    entry[1][1] = row[bse_col].strip()
+    return securities
+
+
+def master_files(directory=DEFAULT_MASTER_DIR):
+    return sorted(glob.glob(os.path.join(directory, '*.csv')))
+
+
+def _fingerprint(paths, mappings):
+    digest = hashlib.sha256(f"v{INDEX_VERSION}".encode('utf-8'))
+    # Hash the mappings themselves so an edited ticker invalidates the cache
+    for key, tickers in sorted(mappings.items()):
+        digest.update(f"{key}={tickers!r};".encode('utf-8'))
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class TickerMatch:
+    """A resolved holding: tickers in mapping format plus how it was found"""
+    def __init__(self, tickers, confidence, matched_name, method):
+        self.tickers = tickers
+        self.confidence = confidence
+        self.matched_name = matched_name
+        self.method = method  # 'exact' or 'fuzzy'
+
+
+class TickerIndex:
+    """Normalized security-name index with exact and fuzzy lookup
+
+    Exact lookups are a dict hit on the squashed name. Fuzzy lookups gather
+    candidates from a trigram inverted index (ignoring very common trigrams),
+    keep the best few by trigram overlap and re-score those with
+    SequenceMatcher and word overlap, so their cost depends on the posting
+    lists touched rather than on the number of securities.
+
+    A fuzzy match also has to agree on the distinctive part of the name:
+    one name's leading distinctive word must (nearly) start the other's, and the
+    score is capped by how similar the names are once generic words such as
+    TECHNOLOGIES or FINANCE are removed.
+    """
+    def __init__(self, securities=(), mappings=None):
+        self.fingerprint = None
+        self.names = []
+        self.keys = []
+        self.tokens = []
+        self.cores = []  # distinctive tokens joined, e.g. ZENSAR
+        self.leads = []  # first distinctive token
+        self.tickers = []
+        self.exact = {}
+        self.postings = {}  # trigram -> array of entry ids
+        self.trigram_counts = array('H')
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+        # Hand-kept mappings win over the master for names they cover
+        for key, tickers in (mappings or {}).items():
+            self._add(key, squash_name(key), tickers)
+        for name, tickers in securities:
+            self._add(name, squash_name(name), tickers)
+        self._prune_common_trigrams()
+
+    def _add(self, name, key, tickers):
+        if not key or key in self.exact:
+            return
+        entry_id = len(self.keys)
+        self.exact[key] = entry_id
+        self.names.append(name)
+        self.keys.append(key)
+        self.tokens.append(frozenset(name_tokens(name)))
+        distinctive = distinctive_tokens(name)
+        self.cores.append(''.join(distinctive))
+        self.leads.append(distinctive[0])
+        self.tickers.append(list(tickers))
+        grams = trigrams(key)
+        self.trigram_counts.append(min(len(grams), 65535))
+        for gram in grams:
+            self.postings.setdefault(gram, array('I')).append(entry_id)
+
+    def _prune_common_trigrams(self):
+        limit = max(50, int(len(self.keys) * COMMON_TRIGRAM_FRACTION))
+        self.postings = {gram: ids for gram, ids in self.postings.items() if len(ids) <= limit}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        state['_resolved'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _score(self, key, tokens, core, lead, entry_id):
+        candidate = self.keys[entry_id]
+        candidate_core = self.cores[entry_id]
+        # Different leading words are different companies (INOX WIND vs INDOWIND)
+        if not (leads_agree(lead, candidate_core) or leads_agree(self.leads[entry_id], core)):
+            return 0.0
+        score = SequenceMatcher(None, key, candidate).ratio()
+        candidate_tokens = self.tokens[entry_id]
+        if len(tokens) > 1 and len(candidate_tokens) > 1:
+            score = max(score, len(tokens & candidate_tokens) / len(tokens | candidate_tokens))
+        if core != candidate_core:
+            score = min(score, SequenceMatcher(None, core, candidate_core).ratio())
+        # Names differing only in a number are usually different securities
+        if DIGITS.findall(key) != DIGITS.findall(candidate):
+            score *= 0.5
+        return score
+
+    def _fuzzy(self, key, tokens, distinctive):
+        grams = trigrams(key)
+        shared = {}
+        for gram in grams:
+            for entry_id in self.postings.get(gram, ()):
+                shared[entry_id] = shared.get(entry_id, 0) + 1
+        if not shared:
+            return None
+
+        # Dice coefficient over trigrams picks the candidates worth re-scoring
+        candidates = sorted(
+            shared,
+            key=lambda entry_id: 2 * shared[entry_id] / (len(grams) + self.trigram_counts[entry_id]),
+            reverse=True
+        )[:CANDIDATES]
+        core, lead = ''.join(distinctive), distinctive[0]
+        scores = {entry_id: self._score(key, tokens, core, lead, entry_id) for entry_id in candidates}
+        best = max(scores, key=scores.get)
+        return best, scores[best]
+
+    def lookup(self, name):
+        """Best match for a company name regardless of confidence, or None"""
+        key = squash_name(name)
+        entry_id = self.exact.get(key)
+        if entry_id is not None:
+            return TickerMatch(self.tickers[entry_id], 1.0, self.names[entry_id], 'exact')
+
+        found = self._fuzzy(key, frozenset(name_tokens(name)), distinctive_tokens(name)) if key else None
+        if found is None:
+            return None
+        entry_id, confidence = found
+        return TickerMatch(self.tickers[entry_id], confidence, self.names[entry_id], 'fuzzy')
+
+    def resolve(self, name, min_confidence=DEFAULT_MIN_CONFIDENCE):
+        """Match for a company name if it is confident enough, memoized per name"""
+        with self._lock:
+            if name in self._resolved:
+                match = self._resolved[name]
+            else:
+                match = self._resolved[name] = self.lookup(name)
+        if match is None or match.confidence < min_confidence:
+            return None
+        return match
+
+    def save(self, path):
+        # A unique temp file per writer, since shard processes may rebuild the index together
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load_or_build(cls, paths=None, cache_path=DEFAULT_INDEX_CACHE, mappings=None):
+        """Load the pickled index if the master files are unchanged, otherwise rebuild and cache it"""
+        paths = master_files() if paths is None else list(paths)
+        mappings = COMPANY_TICKER_MAPPINGS if mappings is None else mappings
+        fingerprint = _fingerprint(paths, mappings)
+
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    index = pickle.load(f)
+                if isinstance(index, cls) and index.fingerprint == fingerprint:
+                    return index
+            except Exception as e:
+                print(f"Warning: Ignoring unreadable ticker index cache ({str(e)})")
+
+        index = cls(load_security_master(paths).values(), mappings)
+        index.fingerprint = fingerprint
+        if cache_path:
+            try:
+                index.save(cache_path)
+            except OSError as e:
+                print(f"Warning: Could not save ticker index cache ({str(e)})")
+        return index
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_ticker_index():
+    """Process-wide index, built or loaded on first use"""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = TickerIndex.load_or_build()
+        return _default_index